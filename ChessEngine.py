@@ -1,5 +1,39 @@
 # ChessEngine.py
-from copy import deepcopy
+from collections import OrderedDict
+from piece_tables import MATERIAL, PST, board_scores, move_score_delta
+from zobrist import (PIECE_KEYS, SIDE_KEY, castling_hash, compute_hash, en_passant_hash,
+                     move_hash_delta, move_pawn_hash_delta, pawn_hash)
+
+KNIGHT_OFFSETS = [(-2,-1),(-2,1),(-1,-2),(-1,2),(1,-2),(1,2),(2,-1),(2,1)]
+KING_OFFSETS = [(-1,-1),(-1,0),(-1,1),(0,-1),(0,1),(1,-1),(1,0),(1,1)]
+ROOK_DIRECTIONS = [(-1,0),(1,0),(0,-1),(0,1)]
+BISHOP_DIRECTIONS = [(-1,-1),(-1,1),(1,-1),(1,1)]
+
+# ---------------- compact move encoding ----------------
+# 16-bit move codes used by move generation and search:
+#   bits 0-5 from square, 6-11 to square (sq = row * 8 + col),
+#   12-13 promotion piece (index into PROMOTION_PIECES), 14-15 flag.
+FLAG_NORMAL, FLAG_PROMOTION, FLAG_EN_PASSANT, FLAG_CASTLING = 0, 1, 2, 3
+PROMOTION_PIECES = "NBRQ"
+
+def encode_move(start_sq, end_sq, flag=FLAG_NORMAL, promotion='Q'):
+    code = start_sq | (end_sq << 6) | (flag << 14)
+    if flag == FLAG_PROMOTION:
+        code |= PROMOTION_PIECES.index(promotion.upper()) << 12
+    return code
+
+# ---------------- compact position encoding ----------------
+# PACKED_SIZE bytes: one nibble per square, square 0 (a8) in the low nibble
+# of the first byte. 0 is empty, 1-12 index PACKED_PIECES, and the three
+# spare codes fold in the rest of the position:
+#   13 a rook that can still castle (white on rank 1, black on rank 8)
+#   14 the pawn that just moved two squares (the en-passant square is behind it)
+#   15 the black king, with black to move
+PACKED_SIZE = 32
+PACKED_PIECES = ("--", "wp", "wN", "wB", "wR", "wQ", "wK", "bp", "bN", "bB", "bR", "bQ", "bK")
+PACKED_CASTLING_ROOK, PACKED_EN_PASSANT_PAWN, PACKED_BLACK_KING_TO_MOVE = 13, 14, 15
+_PACKED_CODES = {piece: code for code, piece in enumerate(PACKED_PIECES)}
+_CASTLING_ROOKS = {63: 'wks', 56: 'wqs', 7: 'bks', 0: 'bqs'}
 
 class CastlingRights:
     def __init__(self, wks, wqs, bks, bqs):
@@ -11,6 +45,42 @@ class CastlingRights:
     def copy(self):
         return CastlingRights(self.wks, self.wqs, self.bks, self.bqs)
 
+class MoveCache:
+    """Small LRU of legal-move tuples keyed by Zobrist key.
+
+    The tuples are shared with every caller, so they are never modified.
+    Entries stay valid across make/undo because the key names the position."""
+
+    def __init__(self, size=64):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        moves = self.entries.get(key)
+        if moves is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return moves
+
+    def put(self, key, moves):
+        self.entries[key] = moves
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __deepcopy__(self, memo):
+        # derived data: a copied position starts with an empty cache
+        return MoveCache(self.size)
+
 class Move:
     ranksToRows = {"1": 7, "2": 6, "3": 5, "4": 4,
                    "5": 3, "6": 2, "7": 1, "8": 0}
@@ -19,6 +89,11 @@ class Move:
                    "e": 4, "f": 5, "g": 6, "h": 7}
     colsToFiles = {v: k for k, v in filesToCols.items()}
 
+    # a Move is only a readable view of a move code for the UI / SAN code,
+    # so keep instances small
+    __slots__ = ("startRow", "startCol", "endRow", "endCol", "pieceMoved", "pieceCaptured",
+                 "isEnPassantMove", "isCastleMove", "promotionChoice", "moveID")
+
     def __init__(self, startSq, endSq, board, isEnPassantMove=False, isCastleMove=False, promotionChoice=None):
         self.startRow, self.startCol = startSq
         self.endRow, self.endCol = endSq
@@ -30,11 +105,29 @@ class Move:
             self.pieceCaptured = ('bp' if self.pieceMoved[0].lower() == 'w' else 'wp')
         self.isCastleMove = isCastleMove
         self.promotionChoice = promotionChoice
-        # For undoing / restoring state
-        self.castlingRightsBefore = None
-        self.enPassantBefore = None
         self.moveID = self.startRow * 1000 + self.startCol * 100 + self.endRow * 10 + self.endCol
 
+    @classmethod
+    def from_code(cls, code, board):
+        """Build the Move view of `code` on `board` (the position before the move)."""
+        start, end, flag = code & 63, (code >> 6) & 63, code >> 14
+        promotion = PROMOTION_PIECES[(code >> 12) & 3] if flag == FLAG_PROMOTION else None
+        return cls(divmod(start, 8), divmod(end, 8), board,
+                   isEnPassantMove=(flag == FLAG_EN_PASSANT), isCastleMove=(flag == FLAG_CASTLING),
+                   promotionChoice=promotion)
+
+    @property
+    def code(self):
+        start = self.startRow * 8 + self.startCol
+        end = self.endRow * 8 + self.endCol
+        if self.isCastleMove:
+            return encode_move(start, end, FLAG_CASTLING)
+        if self.isEnPassantMove:
+            return encode_move(start, end, FLAG_EN_PASSANT)
+        if self.pieceMoved[1] == 'p' and (self.endRow == 0 or self.endRow == 7):
+            return encode_move(start, end, FLAG_PROMOTION, self.promotionChoice or 'Q')
+        return encode_move(start, end)
+
     def __eq__(self, other):
         return isinstance(other, Move) and self.moveID == other.moveID
 
@@ -66,21 +159,243 @@ class GameState:
         self.blackKingLocation = (0, 4)
         self.enPassantPossible = ()  # (r, c) or ()
         self.currentCastlingRights = CastlingRights(True, True, True, True)
+        # rights / en-passant square after each move played, so undo can restore them
         self.castleRightsLog = [self.currentCastlingRights.copy()]
+        self.enPassantLog = [self.enPassantPossible]
+        # moves played with push() (search), kept apart from moveLog / redoLog
+        self._push_stack = []
 
         # flags for convenience 
         self.checkmate = False
         self.stalemate = False
 
-        # simple cache for valid moves
-        self._valid_moves_cache = None
-        self._valid_moves_cache_key = (None, None)  # (len(moveLog), whiteToMove)
+        # recent legal-move results by position key (hits/misses on the cache)
+        self.move_cache = MoveCache()
+
+        # Zobrist key of every position reached so far; the last entry is the current one
+        self.hash_log = [compute_hash(self)]
+        # the same for the pawns alone (pawn hash table key)
+        self.pawn_hash_log = [pawn_hash(self.board)]
+
+        # running material / piece-square totals (white minus black), kept by makeMove/undoMove
+        self.material_score, self.pst_score = board_scores(self.board)
+
+    @property
+    def zobrist_key(self):
+        return self.hash_log[-1]
+
+    @property
+    def pawn_key(self):
+        return self.pawn_hash_log[-1]
+
+    # ---------------- FEN ----------------
+    @classmethod
+    def from_fen(cls, fen):
+        gs = cls()
+        gs.set_fen(fen)
+        return gs
+
+    def set_fen(self, fen):
+        """Load a position from FEN (move counters are ignored); logs and caches
+           start empty, as for a new game."""
+        fields = fen.split()
+        if not fields:
+            raise ValueError("empty FEN")
+        fields += ["w", "-", "-"][len(fields) - 1:]
+        placement, side, castling, ep = fields[:4]
+
+        board = []
+        for rank in placement.split("/"):
+            row = []
+            for ch in rank:
+                if ch.isdigit():
+                    row.extend(["--"] * int(ch))
+                elif ch.upper() in "PNBRQK":
+                    row.append(('w' if ch.isupper() else 'b') + ('p' if ch in "pP" else ch.upper()))
+                else:
+                    raise ValueError("bad piece %r in FEN %r" % (ch, fen))
+            if len(row) != 8:
+                raise ValueError("bad rank %r in FEN %r" % (rank, fen))
+            board.append(row)
+        if len(board) != 8:
+            raise ValueError("FEN %r does not have 8 ranks" % fen)
+
+        self.board = board
+        for r in range(8):
+            for c in range(8):
+                if board[r][c] == "wK":
+                    self.whiteKingLocation = (r, c)
+                elif board[r][c] == "bK":
+                    self.blackKingLocation = (r, c)
+        self.whiteToMove = side != "b"
+        self.currentCastlingRights = CastlingRights("K" in castling, "Q" in castling,
+                                                    "k" in castling, "q" in castling)
+        self.enPassantPossible = ()
+        if ep != "-":
+            self.enPassantPossible = (Move.ranksToRows[ep[1]], Move.filesToCols[ep[0]])
+        self._reset_history(compute_hash(self), pawn_hash(self.board), *board_scores(self.board))
+
+    def to_fen(self):
+        """FEN of the position. Move counters are not tracked, so they are
+           written as "0 1" (set_fen ignores them)."""
+        rows = []
+        for row in self.board:
+            text = ""
+            empty = 0
+            for piece in row:
+                if piece == "--":
+                    empty += 1
+                    continue
+                if empty:
+                    text += str(empty)
+                    empty = 0
+                text += piece[1].upper() if piece[0] == 'w' else piece[1].lower()
+            rows.append(text + (str(empty) if empty else ""))
+        rights = self.currentCastlingRights
+        castling = (("K" if rights.wks else "") + ("Q" if rights.wqs else "")
+                    + ("k" if rights.bks else "") + ("q" if rights.bqs else "")) or "-"
+        ep = "-"
+        if self.enPassantPossible:
+            r, c = self.enPassantPossible
+            ep = Move.colsToFiles[c] + Move.rowsToRanks[r]
+        return "%s %s %s %s 0 1" % ("/".join(rows), "w" if self.whiteToMove else "b", castling, ep)
+
+    def _reset_history(self, key, pawn_key, material, pst):
+        """Start the logs over from a freshly loaded position, as in a new
+           game. The lists are emptied in place, so reloading an object
+           allocates nothing; the move cache is kept (it is keyed by position)."""
+        self.moveLog.clear()
+        self.redoLog.clear()
+        self.castleRightsLog.clear()
+        self.castleRightsLog.append(self.currentCastlingRights.copy())
+        self.enPassantLog.clear()
+        self.enPassantLog.append(self.enPassantPossible)
+        self._push_stack.clear()
+        self.checkmate = False
+        self.stalemate = False
+        self.hash_log.clear()
+        self.hash_log.append(key)
+        self.pawn_hash_log.clear()
+        self.pawn_hash_log.append(pawn_key)
+        self.material_score = material
+        self.pst_score = pst
+
+    # ---------------- compact encoding ----------------
+    def pack(self):
+        """The position as PACKED_SIZE bytes (see PACKED_PIECES); castling
+           rights whose rook has left its corner cannot be used and are not kept."""
+        codes = [_PACKED_CODES[piece] for row in self.board for piece in row]
+        rights = self.currentCastlingRights
+        for sq, right in _CASTLING_ROOKS.items():
+            if getattr(rights, right) and codes[sq] == _PACKED_CODES["wR" if sq > 31 else "bR"]:
+                codes[sq] = PACKED_CASTLING_ROOK
+        if self.enPassantPossible:
+            r, c = self.enPassantPossible
+            codes[(r - 1 if r == 5 else r + 1) * 8 + c] = PACKED_EN_PASSANT_PAWN
+        if not self.whiteToMove:
+            r, c = self.blackKingLocation
+            codes[r * 8 + c] = PACKED_BLACK_KING_TO_MOVE
+        return bytes(codes[i] | codes[i + 1] << 4 for i in range(0, 64, 2))
+
+    def set_packed(self, data, offset=0):
+        """Load the position packed at `offset` in `data` (bytes, bytearray,
+           mmap ...) into this object, reusing its board rows and logs, so a
+           bulk loader can stream positions through one GameState. Logs start
+           empty, as after set_fen."""
+        board = self.board
+        key = pawn_key = 0
+        material = pst = 0
+        rights = CastlingRights(False, False, False, False)
+        ep = ()
+        white_to_move = True
+        for sq in range(64):
+            code = data[offset + (sq >> 1)] >> ((sq & 1) << 2) & 15
+            r, c = sq >> 3, sq & 7
+            if code < PACKED_CASTLING_ROOK:
+                piece = PACKED_PIECES[code]
+            elif code == PACKED_CASTLING_ROOK:
+                if sq not in _CASTLING_ROOKS:
+                    raise ValueError("castling rook code on square %d" % sq)
+                piece = "wR" if r == 7 else "bR"
+                setattr(rights, _CASTLING_ROOKS[sq], True)
+            elif code == PACKED_EN_PASSANT_PAWN:
+                if r not in (3, 4):
+                    raise ValueError("en-passant pawn code on square %d" % sq)
+                piece, ep = ("wp", (5, c)) if r == 4 else ("bp", (2, c))
+            else:
+                piece = "bK"
+                white_to_move = False
+            board[r][c] = piece
+            if piece != "--":
+                key ^= PIECE_KEYS[piece][sq]
+                material += MATERIAL[piece]
+                pst += PST[piece][sq]
+                if piece[1] == 'p':
+                    pawn_key ^= PIECE_KEYS[piece][sq]
+                elif piece[1] == 'K':
+                    if piece[0] == 'w':
+                        self.whiteKingLocation = (r, c)
+                    else:
+                        self.blackKingLocation = (r, c)
+        self.whiteToMove = white_to_move
+        self.currentCastlingRights = rights
+        self.enPassantPossible = ep
+        key ^= castling_hash(rights) ^ en_passant_hash(board, ep, white_to_move)
+        if white_to_move:
+            key ^= SIDE_KEY
+        self._reset_history(key, pawn_key, material, pst)
+
+    # ---------------- SAN ----------------
+    def parse_san(self, san):
+        """The legal Move written as `san` in this position (the notation
+           main.move_to_san writes: "e4", "Nbd7", "exd6", "e8=Q+", "O-O");
+           raises ValueError if no single legal move matches."""
+        text = san.strip().rstrip("+#!?")
+        moves = self.getValidMoves()
+        if text in ("O-O", "0-0", "O-O-O", "0-0-0"):
+            long_castle = len(text) == 5
+            for move in moves:
+                if move.isCastleMove and (move.endCol == 2) == long_castle:
+                    return move
+            raise ValueError("illegal castling %r" % san)
+
+        promotion = None
+        if "=" in text:
+            text, promotion = text.split("=", 1)
+        elif len(text) > 2 and text[-1] in "NBRQ" and text[-2] in "18":
+            text, promotion = text[:-1], text[-1]
+        piece = text[0] if text[0] in "NBRQK" else "p"
+        body = (text[1:] if piece != "p" else text).replace("x", "").replace("-", "")
+        if len(body) < 2 or body[-2] not in Move.filesToCols or body[-1] not in Move.ranksToRows:
+            raise ValueError("bad SAN %r" % san)
+        end = (Move.ranksToRows[body[-1]], Move.filesToCols[body[-2]])
+        hint = body[:-2]
+
+        found = []
+        for move in moves:
+            if move.pieceMoved[1] != piece or (move.endRow, move.endCol) != end:
+                continue
+            if any(Move.filesToCols.get(ch, move.startCol) != move.startCol
+                   or Move.ranksToRows.get(ch, move.startRow) != move.startRow for ch in hint):
+                continue
+            if piece == "p" and end[0] in (0, 7) and (move.promotionChoice or "Q") != (promotion or "Q").upper():
+                continue
+            found.append(move)
+        if len(found) != 1:
+            raise ValueError("%s move %r" % ("ambiguous" if found else "illegal", san))
+        return found[0]
 
     # ---------------- Move execution / undo ----------------
     def makeMove(self, move):
-        # snapshot castle and en-passant
-        move.castlingRightsBefore = self.currentCastlingRights.copy()
-        move.enPassantBefore = self.enPassantPossible
+        self._make(move)
+        self.moveLog.append(move)
+        self.redoLog.clear()
+
+    def _make(self, move):
+        """Play `move` on the position; moveLog / redoLog are left to the caller."""
+        # hash terms that depend on the board before the move
+        key = (self.hash_log[-1] ^ castling_hash(self.currentCastlingRights)
+               ^ en_passant_hash(self.board, self.enPassantPossible, self.whiteToMove))
 
         # move piece
         self.board[move.endRow][move.endCol] = move.pieceMoved
@@ -127,15 +442,26 @@ class GameState:
         self.enPassantPossible = ()
         if len(move.pieceMoved) >= 2 and move.pieceMoved[1].lower() == 'p' and abs(move.startRow - move.endRow) == 2:
             self.enPassantPossible = ((move.startRow + move.endRow) // 2, move.startCol)
+        self.enPassantLog.append(self.enPassantPossible)
 
-        # logs and flip turn
-        self.moveLog.append(move)
-        self.redoLog.clear()
+        # flip turn
         self.whiteToMove = not self.whiteToMove
+        self.hash_log.append(self._next_hash(key, move))
+        self.pawn_hash_log.append(self.pawn_hash_log[-1] ^ move_pawn_hash_delta(move))
+        material, pst = move_score_delta(move)
+        self.material_score += material
+        self.pst_score += pst
 
-        # invalidate cache
-        self._valid_moves_cache = None
-        self._valid_moves_cache_key = (None, None)
+        # the mate flags belong to the old position
+        self.checkmate = False
+        self.stalemate = False
+
+    def _next_hash(self, key, move):
+        """Finish the incremental key update once the board, rights, en-passant
+           square and side to move all reflect `move`."""
+        return (key ^ move_hash_delta(move) ^ SIDE_KEY
+                ^ castling_hash(self.currentCastlingRights)
+                ^ en_passant_hash(self.board, self.enPassantPossible, self.whiteToMove))
 
     def make_move(self, move):
         return self.makeMove(move)
@@ -144,7 +470,11 @@ class GameState:
         if not self.moveLog:
             return
         move = self.moveLog.pop()
+        self._unmake(move)
+        self.redoLog.append(move)
 
+    def _unmake(self, move):
+        """Take back `move`, the last move played with _make."""
         # restore board squares
         self.board[move.startRow][move.startCol] = move.pieceMoved
         # for en-passant the captured pawn is not on end square
@@ -176,40 +506,49 @@ class GameState:
             else:
                 self.blackKingLocation = (move.startRow, move.startCol)
 
-        # restore castling rights snapshot
-        if move.castlingRightsBefore is not None:
-            self.currentCastlingRights = move.castlingRightsBefore.copy()
-        else:
-            # fallback: pop last stored rights if available
-            if self.castleRightsLog:
-                self.castleRightsLog.pop()
-                if self.castleRightsLog:
-                    self.currentCastlingRights = self.castleRightsLog[-1].copy()
-                else:
-                    self.currentCastlingRights = CastlingRights(True, True, True, True)
-
-        # restore enPassantPossible from move snapshot
-        self.enPassantPossible = move.enPassantBefore if move.enPassantBefore is not None else ()
+        # castling rights and en passant come back from the logs
+        self.castleRightsLog.pop()
+        self.currentCastlingRights = self.castleRightsLog[-1].copy()
+        self.enPassantLog.pop()
+        self.enPassantPossible = self.enPassantLog[-1]
 
-        # flip turn and push to redo
+        # flip turn
         self.whiteToMove = not self.whiteToMove
-        self.redoLog.append(move)
+        self.hash_log.pop()
+        self.pawn_hash_log.pop()
+        material, pst = move_score_delta(move)
+        self.material_score -= material
+        self.pst_score -= pst
 
-        # invalidate cache
-        self._valid_moves_cache = None
-        self._valid_moves_cache_key = (None, None)
+        # the mate flags belong to the old position
+        self.checkmate = False
+        self.stalemate = False
 
     def undo_move(self):
         return self.undoMove()
 
     def redoMove(self):
         if self.redoLog:
+            # the rest of the redo history stays available
             move = self.redoLog.pop()
-            self.makeMove(move)
+            self._make(move)
+            self.moveLog.append(move)
 
     def redo_move(self):
         return self.redoMove()
 
+    # ---------------- search make / unmake ----------------
+    def push(self, code):
+        """Play a move code for the search: no moveLog / redoLog entries.
+           Undo it with pop()."""
+        move = Move.from_code(code, self.board)
+        self._make(move)
+        self._push_stack.append(move)
+
+    def pop(self):
+        """Take back the last push()."""
+        self._unmake(self._push_stack.pop())
+
     # ---------------- castling rights update ----------------
     def update_castle_rights(self, move):
         # king moved: remove both castling rights for that color
@@ -268,26 +607,67 @@ class GameState:
 
     # ---------------- move generation ----------------
     def getValidMoves(self):
-        """Return legal moves (filter out those leaving own king in check).
-           Uses a simple cache keyed by (len(moveLog), side_to_move) for speed."""
-        cache_key = (len(self.moveLog), self.whiteToMove)
-        if self._valid_moves_cache is not None and self._valid_moves_cache_key == cache_key:
-            return deepcopy(self._valid_moves_cache)
+        """Return legal moves as a tuple. Checkers and pins are found up front, so
+           only king moves and en passant need their own attack test (no make/undo
+           per move). Results are shared through move_cache, so treat them as
+           read-only."""
+        key = self.zobrist_key
+        validMoves = self.move_cache.get(key)
+        if validMoves is not None:
+            self._set_end_flags(validMoves)
+            return validMoves
+
+        color = 'w' if self.whiteToMove else 'b'
+        enemy = 'b' if color == 'w' else 'w'
+        kr, kc = self.whiteKingLocation if color == 'w' else self.blackKingLocation
+        checkers, pins = self.checks_and_pins()
+
+        # squares a non-king move must land on to answer a single check
+        evasion_squares = None
+        if len(checkers) == 1:
+            cr, cc, dr, dc = checkers[0]
+            evasion_squares = {(cr, cc)}
+            if self.board[cr][cc][1] in ('R', 'B', 'Q'):
+                rr, cc2 = kr + dr, kc + dc
+                while (rr, cc2) != (cr, cc):
+                    evasion_squares.add((rr, cc2))
+                    rr += dr
+                    cc2 += dc
 
-        moves = self.get_all_possible_moves()
         validMoves = []
-        side_white = self.whiteToMove
-        for move in moves:
-            self.makeMove(move)
-            # after moving, check whether the moving side's king is in check
-            if side_white:
-                in_check_after = self.square_under_attack(self.whiteKingLocation[0], self.whiteKingLocation[1], by_color='b')
-            else:
-                in_check_after = self.square_under_attack(self.blackKingLocation[0], self.blackKingLocation[1], by_color='w')
-            if not in_check_after:
-                validMoves.append(move)
-            self.undoMove()
+        for move in self.get_all_possible_moves():
+            if move.pieceMoved[1] == 'K':
+                if move.isCastleMove:
+                    # castling squares are checked for attacks during generation
+                    if not checkers:
+                        validMoves.append(move)
+                    continue
+                # lift the king off so it cannot shield the square behind it
+                self.board[kr][kc] = "--"
+                attacked = self.square_under_attack(move.endRow, move.endCol, by_color=enemy)
+                self.board[kr][kc] = move.pieceMoved
+                if not attacked:
+                    validMoves.append(move)
+            elif move.isEnPassantMove:
+                # rare enough to test directly: both pawns leave their squares at once
+                if not self._en_passant_exposes_king(move, enemy):
+                    validMoves.append(move)
+            elif len(checkers) < 2:
+                pin = pins.get((move.startRow, move.startCol))
+                if pin is not None:
+                    # a pinned piece may only slide along the line to its pinner
+                    er, ec = move.endRow - kr, move.endCol - kc
+                    if er * pin[1] - ec * pin[0] != 0 or er * pin[0] + ec * pin[1] <= 0:
+                        continue
+                if evasion_squares is None or (move.endRow, move.endCol) in evasion_squares:
+                    validMoves.append(move)
+
+        validMoves = tuple(validMoves)
+        self._set_end_flags(validMoves)
+        self.move_cache.put(key, validMoves)
+        return validMoves
 
+    def _set_end_flags(self, validMoves):
         # update checkmate/stalemate flags for convenience
         if not validMoves:
             if self.in_check_for_current_player():
@@ -300,19 +680,134 @@ class GameState:
             self.checkmate = False
             self.stalemate = False
 
-        # cache result
-        self._valid_moves_cache = deepcopy(validMoves)
-        self._valid_moves_cache_key = cache_key
-
-        return deepcopy(validMoves)
-
     def get_valid_moves(self):
         return self.getValidMoves()
 
+    def get_valid_move_codes(self):
+        """Legal moves as move codes, for push()."""
+        return tuple(move.code for move in self.getValidMoves())
+
+    def checks_and_pins(self):
+        """Scan out from the side to move's king.
+           Returns (checkers, pins): checkers is a list of (r, c, dr, dc) with the
+           direction from the king, pins maps a pinned square to its (dr, dc)."""
+        color = 'w' if self.whiteToMove else 'b'
+        kr, kc = self.whiteKingLocation if color == 'w' else self.blackKingLocation
+        checkers = []
+        pins = {}
+        for dr, dc in ROOK_DIRECTIONS + BISHOP_DIRECTIONS:
+            sliders = ('R', 'Q') if dr == 0 or dc == 0 else ('B', 'Q')
+            candidate = None
+            rr, cc = kr + dr, kc + dc
+            while 0 <= rr <= 7 and 0 <= cc <= 7:
+                piece = self.board[rr][cc]
+                if piece != "--":
+                    if piece[0] == color:
+                        if candidate is not None:
+                            break
+                        candidate = (rr, cc)
+                    else:
+                        if piece[1] in sliders:
+                            if candidate is None:
+                                checkers.append((rr, cc, dr, dc))
+                            else:
+                                pins[candidate] = (dr, dc)
+                        break
+                rr += dr
+                cc += dc
+        enemy = 'b' if color == 'w' else 'w'
+        for dr, dc in KNIGHT_OFFSETS:
+            rr, cc = kr + dr, kc + dc
+            if 0 <= rr <= 7 and 0 <= cc <= 7 and self.board[rr][cc] == enemy + 'N':
+                checkers.append((rr, cc, dr, dc))
+        pawn_row = kr - 1 if color == 'w' else kr + 1
+        if 0 <= pawn_row <= 7:
+            for cc in (kc - 1, kc + 1):
+                if 0 <= cc <= 7 and self.board[pawn_row][cc] == enemy + 'p':
+                    checkers.append((pawn_row, cc, pawn_row - kr, cc - kc))
+        return checkers, pins
+
+    def _en_passant_exposes_king(self, move, enemy):
+        board = self.board
+        captured_sq = (move.startRow, move.endCol)
+        board[move.startRow][move.startCol] = "--"
+        board[captured_sq[0]][captured_sq[1]] = "--"
+        board[move.endRow][move.endCol] = move.pieceMoved
+        king = self.whiteKingLocation if enemy == 'b' else self.blackKingLocation
+        exposed = self.square_under_attack(king[0], king[1], by_color=enemy)
+        board[move.endRow][move.endCol] = "--"
+        board[captured_sq[0]][captured_sq[1]] = move.pieceCaptured
+        board[move.startRow][move.startCol] = move.pieceMoved
+        return exposed
+
     def in_check_for_current_player(self):
         king = self.whiteKingLocation if self.whiteToMove else self.blackKingLocation
         return self.square_under_attack(king[0], king[1], by_color=('b' if self.whiteToMove else 'w'))
 
+    # ---------------- mobility ----------------
+    def count_mobility(self, color):
+        """Pseudo-legal target counts per piece type for `color` ('w' or 'b').
+           Builds no Move objects and leaves side to move and the move cache alone."""
+        counts = {'P': 0, 'N': 0, 'B': 0, 'R': 0, 'Q': 0, 'K': 0}
+        board = self.board
+        for r in range(8):
+            for c in range(8):
+                piece = board[r][c]
+                if piece == "--" or piece[0] != color:
+                    continue
+                ptype = piece[1].upper()
+                n = 0
+                if ptype == 'P':
+                    direction = -1 if color == 'w' else 1
+                    nr = r + direction
+                    if 0 <= nr <= 7:
+                        if board[nr][c] == "--":
+                            n += 1
+                            if r == (6 if color == 'w' else 1) and board[nr + direction][c] == "--":
+                                n += 1
+                        for nc in (c - 1, c + 1):
+                            if 0 <= nc <= 7:
+                                target = board[nr][nc]
+                                if target != "--" and target[0] != color:
+                                    n += 1
+                elif ptype == 'N' or ptype == 'K':
+                    for dr, dc in (KNIGHT_OFFSETS if ptype == 'N' else KING_OFFSETS):
+                        nr, nc = r + dr, c + dc
+                        if 0 <= nr <= 7 and 0 <= nc <= 7 and board[nr][nc][0] != color:
+                            n += 1
+                else:
+                    if ptype == 'R':
+                        directions = ROOK_DIRECTIONS
+                    elif ptype == 'B':
+                        directions = BISHOP_DIRECTIONS
+                    else:
+                        directions = ROOK_DIRECTIONS + BISHOP_DIRECTIONS
+                    for dr, dc in directions:
+                        nr, nc = r + dr, c + dc
+                        while 0 <= nr <= 7 and 0 <= nc <= 7:
+                            target = board[nr][nc]
+                            if target == "--":
+                                n += 1
+                            else:
+                                if target[0] != color:
+                                    n += 1
+                                break
+                            nr += dr
+                            nc += dc
+                counts[ptype] += n
+        return counts
+
+    def pawn_bitboards(self):
+        """(white pawns, black pawns) as bitboards, bit r * 8 + c per square."""
+        white = black = 0
+        for r in range(1, 7):
+            for c, piece in enumerate(self.board[r]):
+                if piece == "wp":
+                    white |= 1 << (r * 8 + c)
+                elif piece == "bp":
+                    black |= 1 << (r * 8 + c)
+        return white, black
+
     # ---------------- attack detection (no recursion) ----------------
     def square_under_attack(self, r, c, by_color=None):
         attacker = by_color if by_color is not None else ('b' if self.whiteToMove else 'w')
@@ -438,7 +933,7 @@ class GameState:
 
         # forward one
         if 0 <= r + direction <= 7 and self.board[r + direction][c] == "--":
-            moves.append(Move((r, c), (r + direction, c), self.board))
+            self._add_pawn_move((r, c), (r + direction, c), moves)
             # forward two from start
             if r == startRow and self.board[r + 2*direction][c] == "--":
                 moves.append(Move((r, c), (r + 2*direction, c), self.board))
@@ -450,10 +945,18 @@ class GameState:
             if 0 <= nc <= 7 and 0 <= nr <= 7:
                 target = self.board[nr][nc]
                 if target != "--" and target[0].lower() != color:
-                    moves.append(Move((r, c), (nr, nc), self.board))
+                    self._add_pawn_move((r, c), (nr, nc), moves)
                 elif (nr, nc) == self.enPassantPossible:
                     moves.append(Move((r, c), (nr, nc), self.board, isEnPassantMove=True))
 
+    def _add_pawn_move(self, start, end, moves):
+        # a pawn reaching the last rank may become any piece; queen first
+        if end[0] == 0 or end[0] == 7:
+            for choice in "QRBN":
+                moves.append(Move(start, end, self.board, promotionChoice=choice))
+        else:
+            moves.append(Move(start, end, self.board))
+
     def _slide_moves(self, r, c, directions, moves):
         color = self.board[r][c][0].lower()
         for dr, dc in directions:
@@ -1,154 +1,736 @@
 # ai_engine.py
+import atexit
 import math
+import multiprocessing
+import os
+import queue
 import time
 import random
 import ChessEngine
+from bitboard import BOARD_MASK, PAWN_ATTACKS, SEE_VALUES, BitboardGameState, iter_squares, popcount
+# material and piece-square tables live in piece_tables so positions can keep running totals
+from piece_tables import piece_values
+from polyglot import OpeningBook
+import tablebase
+from transposition import (EXACT, LOWER, UPPER, PawnHashTable, SharedTranspositionTable,
+                           TranspositionTable)
+
+# shared across find_best_move calls so later searches reuse earlier work
+TT_SIZE_MB = 16
+transposition_table = TranspositionTable(TT_SIZE_MB)
 
 # ---------------------- PIECE VALUES ----------------------
-piece_values = {
-    "K": 0, "Q": 9, "R": 5, "B": 3, "N": 3, "P": 1,
-    "k": 0, "q": 9, "r": 5, "b": 3, "n": 3, "p": 1
-}
+MATE_SCORE = 9999
 
-# ---------------------- POSITIONAL TABLES ----------------------
-pawn_table = [
-    [0, 0, 0, 0, 0, 0, 0, 0],
-    [5, 5, 5, 5, 5, 5, 5, 5],
-    [1, 1, 2, 3, 3, 2, 1, 1],
-    [0.5, 0.5, 1, 2.5, 2.5, 1, 0.5, 0.5],
-    [0, 0, 0, 2, 2, 0, 0, 0],
-    [0.5, -0.5, -1, 0, 0, -1, -0.5, 0.5],
-    [0.5, 1, 1, -2, -2, 1, 1, 0.5],
-    [0, 0, 0, 0, 0, 0, 0, 0]
-]
-
-piece_square_tables = {
-    "P": pawn_table,
-    "p": pawn_table[::-1],
-}
+# pawns per pseudo-legal target square
+mobility_weights = {"P": 0.1, "N": 0.1, "B": 0.1, "R": 0.1, "Q": 0.1, "K": 0.1}
 
 # ---------------------- EVALUATION ----------------------
 def evaluate_board(gs):
-    """Improved evaluation: material + piece-square + mobility"""
+    """Improved evaluation: material + piece-square + mobility + pawn structure"""
     # Use the correct attribute names from your GameState
     if getattr(gs, "checkmate", False):
-        return -9999 if gs.whiteToMove else 9999
+        return -MATE_SCORE if gs.whiteToMove else MATE_SCORE
     elif getattr(gs, "stalemate", False):
         return 0
 
-    value = 0
-    for r in range(8):
-        for c in range(8):
-            piece = gs.board[r][c]
-            if piece == "--":
-                continue
-            color, symbol = piece[0], piece[1].upper()
-            piece_value = piece_values.get(symbol, 0)
-            sign = 1 if color == 'w' else -1
+    # material and piece-square totals are maintained incrementally by makeMove/undoMove
+    value = gs.material_score + gs.pst_score
 
-            value += sign * piece_value
+    # Mobility bonus: pseudo-legal targets per piece type for both sides
+    white = gs.count_mobility('w')
+    black = gs.count_mobility('b')
+    for ptype, weight in mobility_weights.items():
+        value += (white[ptype] - black[ptype]) * weight
 
-            # Positional bonus
-            if symbol in piece_square_tables:
-                if color == 'w':
-                    value += piece_square_tables[symbol][r][c] * sign
-                else:
-                    value -= piece_square_tables[symbol.lower()][r][c] * sign
+    return value + pawn_evaluation(gs)
 
-    # Mobility bonus (more legal moves = better)
-    # Save current turn, compute mobility for both sides safely
-    current_turn = gs.whiteToMove
-    # white mobility
-    gs.whiteToMove = True
-    white_moves = len(gs.get_valid_moves())
-    # black mobility
-    gs.whiteToMove = False
-    black_moves = len(gs.get_valid_moves())
-    # restore
-    gs.whiteToMove = current_turn
+def evaluate_side_to_move(gs):
+    """evaluate_board from the point of view of the side to move (for negamax)."""
+    value = evaluate_board(gs)
+    return value if gs.whiteToMove else -value
+
+# ---------------------- PAWN STRUCTURE ----------------------
+# penalties and bonuses in pawns
+DOUBLED_PAWN = 0.2   # per pawn beyond the first on a file
+ISOLATED_PAWN = 0.15  # no friendly pawn on either neighbouring file
+BACKWARD_PAWN = 0.1  # neighbours all ahead of it, and its stop square hit by an enemy pawn
+# passed pawn bonus by ranks advanced; a blocked passer (square ahead occupied) keeps half
+PASSED_PAWN = (0.0, 0.05, 0.1, 0.2, 0.35, 0.6)
+BLOCKED_PASSED_PAWN = 0.5
+
+PAWN_HASH_SIZE_KB = 512
+pawn_hash_table = PawnHashTable(PAWN_HASH_SIZE_KB)
+
+FILE_MASKS = [0x0101010101010101 << c for c in range(8)]
+ADJACENT_FILES = [(FILE_MASKS[c - 1] if c else 0) | (FILE_MASKS[c + 1] if c < 7 else 0) for c in range(8)]
+# rows 0 .. r - 1 (towards rank 8), for r = 0 .. 8
+_ROWS_BEFORE = [(1 << 8 * r) - 1 for r in range(9)]
+# squares in front of a pawn on its own and neighbouring files (no enemy pawns there: passed)
+FRONT_SPAN = {
+    'w': [(FILE_MASKS[sq & 7] | ADJACENT_FILES[sq & 7]) & _ROWS_BEFORE[sq >> 3] for sq in range(64)],
+    'b': [(FILE_MASKS[sq & 7] | ADJACENT_FILES[sq & 7]) & ~_ROWS_BEFORE[(sq >> 3) + 1] & BOARD_MASK
+          for sq in range(64)],
+}
+# neighbouring-file squares level with or behind a pawn: the pawns that could still support it
+SUPPORT_SPAN = {
+    'w': [ADJACENT_FILES[sq & 7] & ~_ROWS_BEFORE[sq >> 3] & BOARD_MASK for sq in range(64)],
+    'b': [ADJACENT_FILES[sq & 7] & _ROWS_BEFORE[(sq >> 3) + 1] for sq in range(64)],
+}
 
-    value += (white_moves - black_moves) * 0.1
+def pawn_structure(white, black):
+    """(score, white passed, black passed) for pawn bitboards `white` and
+       `black`: doubled, isolated, backward and passed pawn terms, white's view."""
+    score = 0.0
+    passed = {'w': 0, 'b': 0}
+    for color, own, enemy, sign in (('w', white, black, 1), ('b', black, white, -1)):
+        for mask in FILE_MASKS:
+            count = popcount(own & mask)
+            if count > 1:
+                score -= sign * DOUBLED_PAWN * (count - 1)
+        front, support, step = FRONT_SPAN[color], SUPPORT_SPAN[color], (-8 if color == 'w' else 8)
+        for sq in iter_squares(own):
+            c = sq & 7
+            if not own & ADJACENT_FILES[c]:
+                score -= sign * ISOLATED_PAWN
+            elif not own & support[sq] and PAWN_ATTACKS[color][sq + step] & enemy:
+                score -= sign * BACKWARD_PAWN
+            # passed: no enemy pawn ahead on its own or a neighbouring file, and
+            # not behind a pawn of its own
+            if not enemy & front[sq] and not own & front[sq] & FILE_MASKS[c]:
+                passed[color] |= 1 << sq
+                score += sign * PASSED_PAWN[6 - (sq >> 3) if color == 'w' else (sq >> 3) - 1]
+    return score, passed['w'], passed['b']
 
-    return value
+def pawn_evaluation(gs, table=None):
+    """Pawn-structure score (white's view). The pawn-only part comes from the
+       pawn hash table, computed on a miss; blocked passed pawns depend on
+       the pieces too, so they are checked here from the cached masks."""
+    table = pawn_hash_table if table is None else table
+    key = gs.pawn_key
+    entry = table.probe(key)
+    if entry is None:
+        entry = pawn_structure(*gs.pawn_bitboards())
+        table.store(key, *entry)
+    score, white_passed, black_passed = entry
+    board = gs.board
+    for sq in iter_squares(white_passed):
+        if board[(sq >> 3) - 1][sq & 7] != "--":
+            score -= PASSED_PAWN[6 - (sq >> 3)] * BLOCKED_PASSED_PAWN
+    for sq in iter_squares(black_passed):
+        if board[(sq >> 3) + 1][sq & 7] != "--":
+            score += PASSED_PAWN[(sq >> 3) - 1] * BLOCKED_PASSED_PAWN
+    return score
 
 # ---------------------- MOVE ORDERING ----------------------
-def order_moves(gs, moves):
-    def move_score(move):
-        score = 0
-        if move.pieceCaptured != "--":
-            # reward captures by victim value minus attacker value
-            victim = move.pieceCaptured[1].upper()
-            attacker = move.pieceMoved[1].upper()
-            score += (piece_values.get(victim, 0) - piece_values.get(attacker, 0)) * 10
-        # prefer promotions if present (some Move implementations set isPawnPromotion)
-        if getattr(move, 'isPawnPromotion', False):
-            score += 800
+MAX_PLY = 64
+
+def is_quiet(board, code):
+    """True for moves that neither capture nor promote."""
+    to = (code >> 6) & 63
+    return board[to >> 3][to & 7] == "--" and (code >> 14) in (ChessEngine.FLAG_NORMAL,
+                                                               ChessEngine.FLAG_CASTLING)
+
+def mvv_lva(board, code):
+    """Most valuable victim first, then least valuable attacker; promotions
+       count the new piece as part of the gain."""
+    to = (code >> 6) & 63
+    flag = code >> 14
+    victim = board[to >> 3][to & 7]
+    score = piece_values[victim[1].upper()] * 10 if victim != "--" else 0
+    if flag == ChessEngine.FLAG_EN_PASSANT:
+        score = piece_values["P"] * 10
+    elif flag == ChessEngine.FLAG_PROMOTION:
+        score += piece_values[ChessEngine.PROMOTION_PIECES[(code >> 12) & 3]] * 10
+    frm = code & 63
+    return score - piece_values[board[frm >> 3][frm & 7][1].upper()]
+
+def order_moves(gs, moves, hash_move=0):
+    """Sort move codes best-first: hash move, captures and promotions by
+       MVV-LVA, castling, other quiet moves."""
+    board = gs.board
+    def move_score(code):
+        if code == hash_move:
+            return math.inf
+        if not is_quiet(board, code):
+            return 1000 + mvv_lva(board, code)
         # small bonus for castling
-        if getattr(move, 'isCastleMove', False):
-            score += 50
-        return score
+        return 50 if code >> 14 == ChessEngine.FLAG_CASTLING else 0
     return sorted(moves, key=move_score, reverse=True)
 
-# ---------------------- MINIMAX + ALPHA-BETA ----------------------
-def minimax(gs, depth, alpha, beta, maximizing_player, start_time, time_limit):
-    # time cutoff
-    if (time.time() - start_time) > time_limit:
-        return evaluate_board(gs), None
+class MoveOrderer:
+    """Killer moves (two per ply) and history scores for quiet moves, kept for
+    one search, plus the staged move picker that uses them."""
 
-    if depth == 0 or gs.is_game_over():
-        return evaluate_board(gs), None
+    def __init__(self):
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        # [side to move][from | to << 6]: credit for quiet moves that caused cutoffs
+        self.history = [[0] * 4096, [0] * 4096]
 
-    valid_moves = gs.get_valid_moves()
-    if not valid_moves:
-        return evaluate_board(gs), None
+    def record_cutoff(self, gs, code, depth, ply):
+        """Remember a quiet move that failed high (call before pushing it)."""
+        if ply < MAX_PLY:
+            killers = self.killers[ply]
+            if killers[0] != code:
+                killers[1] = killers[0]
+                killers[0] = code
+        self.history[gs.whiteToMove][code & 4095] += depth * depth
 
-    # move ordering helps pruning
-    valid_moves = order_moves(gs, valid_moves)
+    def moves(self, gs, hash_move, ply):
+        """Yield legal move codes in stages: hash move, captures and promotions
+        by MVV-LVA, killers, then quiet moves by history. A stage is generated
+        only once the previous one is used up, so a cutoff early on never pays
+        for generating or sorting the quiet moves."""
+        if hash_move and gs.is_legal(hash_move):
+            yield hash_move
+        else:
+            hash_move = 0
 
-    best_move = None
-    if maximizing_player:
-        max_eval = -math.inf
-        for move in valid_moves:
-            gs.makeMove(move)
-            eval_score, _ = minimax(gs, depth - 1, alpha, beta, False, start_time, time_limit)
-            gs.undoMove()
-            if eval_score > max_eval:
-                max_eval = eval_score
-                best_move = move
-            alpha = max(alpha, eval_score)
-            if beta <= alpha:
-                break
-        return max_eval, best_move
+        board = gs.board
+        captures = gs.get_capture_codes()
+        captures.sort(key=lambda code: mvv_lva(board, code), reverse=True)
+        for code in captures:
+            if code != hash_move:
+                yield code
+
+        killers = []
+        if ply < MAX_PLY:
+            killers = [code for code in self.killers[ply]
+                       if code and code != hash_move and is_quiet(board, code) and gs.is_legal(code)]
+        for code in killers:
+            yield code
+
+        quiets = gs.get_quiet_codes()
+        history = self.history[gs.whiteToMove]
+        quiets.sort(key=lambda code: history[code & 4095], reverse=True)
+        for code in quiets:
+            if code != hash_move and code not in killers:
+                yield code
+
+# ---------------------- TIME MANAGEMENT ----------------------
+class SearchTimeout(Exception):
+    """Raised inside the search once the hard time limit has passed."""
+
+class TimeManager:
+    """Soft and hard deadlines for one find_best_move call.
+
+    No new iteration is started after the soft limit; the hard limit aborts the
+    iteration in progress. The clock is only read every `check_interval` nodes
+    (a power of two) so time checks stay off the per-node path. Setting the
+    optional `stop` event (a multiprocessing.Event) aborts the search at once;
+    `on_check`, if set, is called with the manager at every check.
+
+    With a `ponderhit` event the search is pondering (running on the
+    opponent's time) and no limit applies until the event is set. The time
+    spent pondering counts, so after a long ponder the move comes at once.
+
+    `max_nodes` is a node budget, kept like the hard limit (for fixed-node
+    analysis, where results must not depend on machine speed)."""
+
+    def __init__(self, soft_limit, hard_limit, check_interval=256, stop=None, ponderhit=None,
+                 max_nodes=math.inf):
+        self.start_time = time.time()
+        self.soft_limit = soft_limit
+        self.hard_limit = hard_limit
+        self.max_nodes = max_nodes
+        self.check_mask = check_interval - 1
+        self.nodes = 0
+        self.depth = 0  # last completed iteration, for progress reports
+        self.stop = stop
+        self.ponderhit = ponderhit
+        self.on_check = None
+        # the first iteration always runs to completion so there is a move to play
+        self.abortable = False
+
+    def elapsed(self):
+        return time.time() - self.start_time
+
+    def pondering(self):
+        if self.ponderhit is None:
+            return False
+        if not self.ponderhit.is_set():
+            return True
+        self.ponderhit = None
+        return False
+
+    def check(self):
+        if self.stop is not None and self.stop.is_set():
+            raise SearchTimeout()
+        if self.on_check is not None:
+            self.on_check(self)
+        if self.abortable and (self.nodes >= self.max_nodes
+                               or (not self.pondering() and self.elapsed() > self.hard_limit)):
+            raise SearchTimeout()
+
+    def soft_expired(self):
+        return self.nodes >= self.max_nodes or (not self.pondering() and self.elapsed() >= self.soft_limit)
+
+# ---------------------- QUIESCENCE ----------------------
+# skip a capture when even winning the victim (plus this margin, in pawns)
+# cannot bring the score back to alpha
+DELTA_MARGIN = 2.0
+
+def quiescence(gs, alpha, beta, tm, ply=0):
+    """Search captures only, until the position is quiet (negamax scores).
+
+    The side to move may "stand pat" on the static evaluation instead of
+    capturing. Captures are ordered by static exchange evaluation; losing
+    ones and ones that cannot reach alpha (delta pruning) are skipped.
+    In check every evasion is searched, so mates are still seen."""
+    tm.nodes += 1
+    if not tm.nodes & tm.check_mask:
+        tm.check()
+
+    if gs.in_check_for_current_player():
+        moves = gs.get_valid_move_codes()
+        if not moves:
+            return -(MATE_SCORE - ply)
+        moves = order_moves(gs, moves)
+        best_score = -math.inf
     else:
-        min_eval = math.inf
-        for move in valid_moves:
-            gs.makeMove(move)
-            eval_score, _ = minimax(gs, depth - 1, alpha, beta, True, start_time, time_limit)
-            gs.undoMove()
-            if eval_score < min_eval:
-                min_eval = eval_score
-                best_move = move
-            beta = min(beta, eval_score)
-            if beta <= alpha:
-                break
-        return min_eval, best_move
+        stand_pat = evaluate_side_to_move(gs)
+        if stand_pat >= beta:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+        best_score = stand_pat
+        scored = []
+        board = gs.board
+        for code in gs.get_capture_codes():
+            # material won on the spot; exchanges afterwards can only lower it
+            to = (code >> 6) & 63
+            victim = board[to >> 3][to & 7]
+            gain = SEE_VALUES[victim[1]] if victim != "--" else 0
+            flag = code >> 14
+            if flag == ChessEngine.FLAG_EN_PASSANT:
+                gain = SEE_VALUES['p']
+            elif flag == ChessEngine.FLAG_PROMOTION:
+                gain += SEE_VALUES[ChessEngine.PROMOTION_PIECES[(code >> 12) & 3]] - SEE_VALUES['p']
+            if stand_pat + gain + DELTA_MARGIN <= alpha:
+                continue
+            # then the same test on the exchange result, which also drops losing captures
+            gain = gs.see(code)
+            if gain < 0 or stand_pat + gain + DELTA_MARGIN <= alpha:
+                continue
+            scored.append((gain, code))
+        scored.sort(reverse=True)
+        moves = [code for _, code in scored]
+
+    for code in moves:
+        gs.push(code)
+        score = -quiescence(gs, -beta, -alpha, tm, ply + 1)
+        gs.pop()
+        if score > best_score:
+            best_score = score
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+    return best_score
+
+# ---------------------- PRINCIPAL VARIATION SEARCH ----------------------
+# Width of the "null" window used to test moves after the first. Scores are
+# float pawns in steps of 0.05, so anything smaller than a step works.
+NULL_WINDOW = 0.001
+# being mated scores -(MATE_SCORE - plies from the root), so a quicker mate
+# scores higher; any score past MATE_BOUND is a mate
+MATE_BOUND = MATE_SCORE - MAX_PLY
+
+def score_to_tt(score, ply):
+    """Table form of a search score: mates counted from this node, not the root."""
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+def score_from_tt(score, ply):
+    """Search score at `ply` of a score stored by score_to_tt."""
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+# Selective search. Each technique can be switched (bench.py --enable/--disable)
+# to measure what it buys; none of them is used in PV nodes or in check.
+# Razoring is off: with futility pruning on it cost nodes on the bench positions.
+NULL_MOVE_PRUNING = True
+LATE_MOVE_REDUCTIONS = True
+FUTILITY_PRUNING = True
+RAZORING = False
+
+# null move: pass and search `depth - 1 - R`; fail high there means the real
+# moves will too. R grows by one from NULL_MOVE_DEEP_DEPTH on.
+NULL_MOVE_MIN_DEPTH = 3
+NULL_MOVE_REDUCTION = 2
+NULL_MOVE_DEEP_DEPTH = 7
+# late move reductions: quiet moves after the first few are searched one ply
+# shallower (two when very late), and again at full depth if they beat alpha
+LMR_MIN_DEPTH = 3
+LMR_FULL_MOVES = 3
+LMR_DEEP_MOVES = 8
+# futility: near the leaves, skip quiet moves when the static evaluation plus
+# this margin (pawns, by remaining depth) cannot reach alpha
+FUTILITY_MARGINS = (0.0, 1.5, 3.0)
+# razoring: drop into quiescence when the static evaluation is this far below alpha
+RAZOR_MARGINS = (0.0, 3.0, 5.0)
+# endgame tablebases (tablebase.py) for positions with three men or fewer, when
+# generated; a tablebase win scores TB_WIN less the plies to mate, which keeps
+# it below the mates the search finds itself
+TABLEBASES = True
+TB_WIN = 5000.0
+
+def tablebase_score(result):
+    """Search score of a tablebase (result, plies to mate) pair."""
+    wdl, plies = result
+    return wdl * (TB_WIN - plies) if wdl else 0.0
+
+def negamax(gs, depth, alpha, beta, tm, tt=None, ply=0, ordering=None, pv=None):
+    """Principal variation search; scores are from the side to move's view.
+
+    The first move gets the full (alpha, beta) window. The others are only
+    tested against a null window around alpha and re-searched in full if they
+    turn out better. When `pv` is a list it is filled with the best line.
+    Outside PV nodes the tree is pruned by null move, razoring and futility,
+    and late quiet moves are reduced."""
+    tm.nodes += 1
+    if not tm.nodes & tm.check_mask:
+        tm.check()
+
+    # a known endgame: the table has the exact result
+    if TABLEBASES and popcount(gs.occupied) <= 3:
+        result = tablebase.probe(gs)
+        if result is not None:
+            return tablebase_score(result)
+
+    if depth <= 0:
+        return quiescence(gs, alpha, beta, tm, ply)
+
+    # transposition table: cut off on a deep enough result, else use its move first.
+    # PV nodes never cut off here, so the principal variation stays complete.
+    pv_node = beta - alpha > NULL_WINDOW
+    hash_move = 0
+    key = gs.zobrist_key
+    if tt is not None:
+        entry = tt.probe(key)
+        if entry is not None:
+            tt_depth, tt_score, tt_bound, hash_move = entry
+            tt_score = score_from_tt(tt_score, ply)
+            if not pv_node and tt_depth >= depth:
+                if (tt_bound == EXACT or (tt_bound == LOWER and tt_score >= beta)
+                        or (tt_bound == UPPER and tt_score <= alpha)):
+                    return tt_score
+    alpha_orig = alpha
+    if ordering is None:
+        ordering = MoveOrderer()
+
+    in_check = gs.in_check_for_current_player()
+    futile = False
+    if not pv_node and not in_check:
+        static = evaluate_side_to_move(gs)
+        if RAZORING and depth <= 2 and static + RAZOR_MARGINS[depth] <= alpha:
+            score = quiescence(gs, alpha, alpha + NULL_WINDOW, tm, ply)
+            if depth == 1 or score <= alpha:
+                return score
+        # zugzwang guards: never two null moves in a row, and only with pieces left
+        if (NULL_MOVE_PRUNING and depth >= NULL_MOVE_MIN_DEPTH and static >= beta
+                and not gs.last_move_was_null() and gs.has_non_pawn_material()):
+            r = NULL_MOVE_REDUCTION + (depth >= NULL_MOVE_DEEP_DEPTH)
+            gs.push_null()
+            score = -negamax(gs, depth - 1 - r, -beta, -beta + NULL_WINDOW, tm, tt, ply + 1, ordering)
+            gs.pop_null()
+            if score >= beta:
+                # a null-move mate score is not proof of a mate
+                return beta if score >= MATE_BOUND else score
+        futile = FUTILITY_PRUNING and depth <= 2 and static + FUTILITY_MARGINS[depth] <= alpha
+
+    # moves come out best-first, one stage at a time
+    board = gs.board
+    killers = ordering.killers[ply] if ply < MAX_PLY else ()
+    best_score = -math.inf
+    best_move = 0
+    searched = 0
+    for move in ordering.moves(gs, hash_move, ply):
+        quiet = is_quiet(board, move)
+        late = (quiet and searched >= LMR_FULL_MOVES and LATE_MOVE_REDUCTIONS
+                and depth >= LMR_MIN_DEPTH and not in_check and move not in killers)
+        child_pv = [] if pv is not None else None
+        gs.push(move)
+        if (futile and quiet and searched) or late:
+            gives_check = gs.in_check_for_current_player()
+            if futile and quiet and searched and not gives_check:
+                gs.pop()
+                # the move could not have raised the score above this bound
+                best_score = max(best_score, static + FUTILITY_MARGINS[depth])
+                continue
+            late = late and not gives_check
+        if not searched:
+            score = -negamax(gs, depth - 1, -beta, -alpha, tm, tt, ply + 1, ordering, child_pv)
+        else:
+            reduction = (1 + (searched >= LMR_DEEP_MOVES and depth >= 5)) if late else 0
+            score = -negamax(gs, depth - 1 - reduction, -alpha - NULL_WINDOW, -alpha, tm, tt,
+                             ply + 1, ordering)
+            if reduction and score > alpha:
+                score = -negamax(gs, depth - 1, -alpha - NULL_WINDOW, -alpha, tm, tt, ply + 1, ordering)
+            if alpha < score < beta:
+                score = -negamax(gs, depth - 1, -beta, -alpha, tm, tt, ply + 1, ordering, child_pv)
+        gs.pop()
+        searched += 1
+        if score > best_score:
+            best_score = score
+            best_move = move
+            if score > alpha:
+                alpha = score
+                if pv is not None:
+                    pv[:] = [move] + child_pv
+                if alpha >= beta:
+                    if quiet:
+                        ordering.record_cutoff(gs, move, depth, ply)
+                    break
+
+    if not searched:
+        # no legal moves: mated (the sooner, the worse) or stalemate
+        return -(MATE_SCORE - ply) if gs.in_check_for_current_player() else 0.0
+
+    # an aborted search raises before getting here, so only complete results are stored.
+    # When every move failed low the "best" one means nothing: keep the old hash move.
+    if tt is not None:
+        if best_score <= alpha_orig:
+            tt.store(key, depth, score_to_tt(best_score, ply), UPPER)
+        else:
+            tt.store(key, depth, score_to_tt(best_score, ply), LOWER if best_score >= beta else EXACT,
+                     best_move)
+    return best_score
+
+def search_root(gs, depth, tm, tt=None, ordering=None, alpha=-math.inf, beta=math.inf):
+    """One iteration at the root, searching within (alpha, beta).
+
+    Returns (score, best_move, runner_up, pv): score is from the side to
+    move's view, best_move a move code (0 if there are no legal moves),
+    runner_up the best bound seen for any other move (None if there is only
+    one) and pv the principal variation as a list of move codes."""
+    hash_move = 0
+    if tt is not None:
+        entry = tt.probe(gs.zobrist_key)
+        if entry is not None:
+            hash_move = entry[3]
+    moves = order_moves(gs, gs.get_valid_move_codes(), hash_move)
+
+    alpha_orig = alpha
+    best_score = -math.inf
+    best_move = 0
+    runner_up = None
+    pv = []
+    for move in moves:
+        child_pv = []
+        gs.push(move)
+        if not best_move:
+            score = -negamax(gs, depth - 1, -beta, -alpha, tm, tt, 1, ordering, child_pv)
+        else:
+            score = -negamax(gs, depth - 1, -alpha - NULL_WINDOW, -alpha, tm, tt, 1, ordering)
+            if alpha < score < beta:
+                score = -negamax(gs, depth - 1, -beta, -alpha, tm, tt, 1, ordering, child_pv)
+        gs.pop()
+        if score > best_score:
+            if best_move:
+                runner_up = best_score
+            best_score, best_move = score, move
+            pv = [move] + child_pv
+        elif runner_up is None or score > runner_up:
+            runner_up = score
+        alpha = max(alpha, score)
+        if alpha >= beta:
+            break
+    if tt is not None and best_move:
+        if best_score <= alpha_orig:
+            tt.store(gs.zobrist_key, depth, best_score, UPPER)
+        else:
+            tt.store(gs.zobrist_key, depth, best_score, LOWER if best_score >= beta else EXACT, best_move)
+    return best_score, best_move, runner_up, pv
 
 # ---------------------- FIND BEST MOVE ----------------------
-def find_best_move(gs, level="intermediate"):
+# (max depth, time budget in seconds); iterative deepening stops at whichever comes first
+LEVELS = {
+    "beginner": (2, 1.5),
+    "intermediate": (4, 3.0),
+    "advanced": (8, 6.0),
+}
+# fraction of the budget after which no new iteration is started
+SOFT_LIMIT_FRACTION = 0.5
+# stop iterating once the best move beats every alternative by this much (pawns)
+EASY_MOVE_MARGIN = 3.0
+# Polyglot opening book, used while the game is still in it (None: no book);
+# weaker levels vary their openings, "advanced" plays the main line
+BOOK_PATH = "book.bin"
+BOOK_SELECTION = {
+    "beginner": "weighted",
+    "intermediate": "weighted",
+    "advanced": "best",
+}
+_book = None
+
+def opening_book():
+    """The OpeningBook at BOOK_PATH, opened on first use; None without one."""
+    global _book
+    if _book is None or _book.path != BOOK_PATH:
+        _book = OpeningBook(BOOK_PATH) if BOOK_PATH and os.path.exists(BOOK_PATH) else None
+    return _book
+
+# aspiration window around the previous iteration's score (pawns); it doubles
+# on each fail and is dropped once wider than the limit. The evaluation swings
+# by up to a couple of pawns between odd and even depths, so narrower windows
+# fail (and re-search) more often than they save.
+ASPIRATION_WINDOW = 2.0
+ASPIRATION_LIMIT = 4.0
+
+def iterative_deepening(gs, max_depth, tm, tt=None, ordering=None, first_depth=1):
+    """Search depth first_depth, first_depth + 1, ... max_depth, yielding
+    (depth, score, move code, runner_up, pv) after each completed iteration;
+    scores are from the side to move's view. After the first iteration each one
+    starts with an aspiration window around the previous score. Stops quietly
+    when the hard time limit aborts an iteration; `gs` is not restored in that
+    case."""
+    if ordering is None:
+        ordering = MoveOrderer()
+    previous = None
+    for depth in range(first_depth, max_depth + 1):
+        window = ASPIRATION_WINDOW
+        alpha, beta = -math.inf, math.inf
+        if previous is not None and abs(previous) < MATE_BOUND:
+            alpha, beta = previous - window, previous + window
+        try:
+            while True:
+                score, move, runner_up, pv = search_root(gs, depth, tm, tt, ordering, alpha, beta)
+                # only a finite bound can fail: with no legal move the score is -inf
+                if alpha > -math.inf and score <= alpha:
+                    window *= 2
+                    alpha = previous - window if window <= ASPIRATION_LIMIT else -math.inf
+                elif beta < math.inf and score >= beta:
+                    window *= 2
+                    beta = previous + window if window <= ASPIRATION_LIMIT else math.inf
+                else:
+                    break
+        except SearchTimeout:
+            return
+        tm.abortable = True
+        if not move:
+            return
+        previous = score
+        yield depth, score, move, runner_up, pv
+
+def pv_moves(gs, pv):
+    """Move views for a line of move codes played from `gs` (left unchanged)."""
+    line_gs = BitboardGameState.from_gamestate(gs)
+    moves = []
+    for code in pv:
+        moves.append(ChessEngine.Move.from_code(code, line_gs.board))
+        line_gs.push(code)
+    return moves
+
+def find_best_move(gs, level="intermediate", tt=None, info=None, workers=None,
+                   stop=None, progress=None, ponderhit=None):
+    """Pick a move for the side to move in `gs` (which is not changed).
+
+    If `info` is a dict it is filled in after every completed iteration with
+    depth, score (pawns, white's view), nodes, time and pv (a list of Move
+    objects, the expected line starting with the returned move). With more
+    than one worker (default SMP_WORKERS) helper processes search the same
+    position through a shared transposition table; see lazy_smp_helper.
+    Setting the `stop` event abandons the search (any legal move is returned);
+    `progress` is called with the TimeManager (nodes, depth) while searching.
+    Passing a `ponderhit` event makes this a ponder search: it ignores the
+    time limits until the event is set (see TimeManager)."""
     lvl = (level or "intermediate").lower()
-    if lvl == "beginner":
-        depth, time_limit = 2, 1.5
-    elif lvl == "intermediate":
-        depth, time_limit = 3, 3.0
-    elif lvl == "advanced":
-        depth, time_limit = 4, 6.0
-    else:
-        depth, time_limit = 3, 3.0
+    max_depth, time_limit = LEVELS.get(lvl, LEVELS["intermediate"])
+    workers = SMP_WORKERS if workers is None else workers
+
+    if tt is None:
+        tt = transposition_table if workers <= 1 else shared_transposition_table()
+    tt.new_search()
+    tm = TimeManager(time_limit * SOFT_LIMIT_FRACTION, time_limit, stop=stop, ponderhit=ponderhit)
+    tm.on_check = progress
 
-    start_time = time.time()
-    # We pass maximizing_player = not gs.whiteToMove because minimax expects
-    maximizing = gs.whiteToMove
-    _, best_move = minimax(gs, depth, -math.inf, math.inf, maximizing, start_time, time_limit)
+    # search a bitboard copy so the caller's position (and its logs) stay untouched
+    search_gs = BitboardGameState.from_gamestate(gs)
+    # Move views are made up front: an aborted iteration leaves search_gs mid-line
+    root_moves = {code: ChessEngine.Move.from_code(code, search_gs.board)
+                  for code in search_gs.get_valid_move_codes()}
+    if len(root_moves) == 1:
+        return next(iter(root_moves.values()))
+
+    # a book move needs no search
+    book = opening_book()
+    if book is not None:
+        code = book.choose(search_gs, BOOK_SELECTION.get(lvl, "weighted"))
+        if code:
+            if info is not None:
+                info.update(depth=0, nodes=0, time=tm.elapsed(), pv=[root_moves[code]], book=True)
+            return root_moves[code]
+
+    # so does a position in the endgame tablebases: the table move is perfect
+    if TABLEBASES:
+        found = tablebase.best_move(search_gs)
+        if found is not None:
+            code, result = found
+            if info is not None:
+                score = tablebase_score(result)
+                info.update(depth=0, score=score if gs.whiteToMove else -score, nodes=0,
+                            time=tm.elapsed(), pv=[root_moves[code]], tablebase=True)
+            return root_moves[code]
+
+    helpers = []
+    if workers > 1:
+        helpers_stop = multiprocessing.Event()
+        results = multiprocessing.Queue()
+        # helpers run until stopped; while pondering there is no time limit yet
+        helper_limit = math.inf if ponderhit is not None else time_limit
+        for worker_id in range(1, workers):
+            helper = multiprocessing.Process(
+                target=lazy_smp_helper, daemon=True,
+                args=(worker_id, search_gs, max_depth, helper_limit, tt, helpers_stop, results))
+            helper.start()
+            helpers.append(helper)
+
+    # iterative deepening: the move from the last completed iteration is always kept
+    best_move = None
+    best_depth = 0
+    for depth, score, move, runner_up, pv in iterative_deepening(search_gs, max_depth, tm, tt):
+        best_move, best_depth = move, depth
+        tm.depth = depth
+        if progress is not None:
+            progress(tm)
+        if info is not None:
+            info.update(depth=depth, score=score if gs.whiteToMove else -score,
+                        nodes=tm.nodes, time=tm.elapsed(), pv=pv_moves(gs, pv))
+        if abs(score) >= MATE_BOUND or tm.soft_expired():
+            break
+        if runner_up is not None and depth >= 2 and abs(score - runner_up) >= EASY_MOVE_MARGIN:
+            break
+
+    if helpers:
+        # stop the helpers and take a helper's move if it completed a deeper iteration
+        helpers_stop.set()
+        nodes = tm.nodes
+        running = len(helpers)
+        while running:
+            try:
+                worker_id, depth, score, move, pv, helper_nodes = results.get(timeout=time_limit)
+            except queue.Empty:
+                break
+            if not depth:
+                running -= 1
+                nodes += helper_nodes
+            elif depth > best_depth:
+                best_move, best_depth = move, depth
+                if info is not None:
+                    info.update(depth=depth, score=score if gs.whiteToMove else -score,
+                                pv=pv_moves(gs, pv))
+        for helper in helpers:
+            helper.join(timeout=1.0)
+            if helper.is_alive():
+                helper.terminate()
+        if info is not None:
+            info.update(nodes=nodes, time=tm.elapsed())
 
     # Beginner randomness to simulate human blunders
     if lvl == "beginner" and best_move is not None:
@@ -162,10 +744,38 @@ def find_best_move(gs, level="intermediate"):
         moves = gs.get_valid_moves()
         return random.choice(moves) if moves else None
 
-    return best_move
-
-
+    return root_moves[best_move]
 
+# ---------------------- PARALLEL SEARCH (LAZY SMP) ----------------------
+# processes per find_best_move call, this one included; Python threads would
+# all share one core under the GIL
+SMP_WORKERS = 1
+_shared_table = None
 
+def shared_transposition_table():
+    """The shared-memory table used by parallel searches, created on first use
+    and kept (like transposition_table) across find_best_move calls."""
+    global _shared_table
+    if _shared_table is None:
+        _shared_table = SharedTranspositionTable(TT_SIZE_MB)
+        atexit.register(_shared_table.close)
+    return _shared_table
 
+def lazy_smp_helper(worker_id, gs, max_depth, time_limit, tt, stop, results):
+    """Body of a helper process: search `gs` like the main process does,
+    sharing its transposition table, until `stop` is set.
 
+    The helpers cooperate only through the table: whatever one of them stores
+    the others find, and slightly different trees (odd helpers start one ply
+    deeper, so they run an iteration ahead) keep them from duplicating each
+    other's work. Each completed iteration is sent to `results` as
+    (worker_id, depth, score, move, pv, nodes), followed by a final entry with
+    depth 0 when the helper finishes."""
+    tm = TimeManager(time_limit, time_limit, stop=stop)
+    tm.abortable = True
+    try:
+        for depth, score, move, _, pv in iterative_deepening(gs, max_depth, tm, tt,
+                                                              first_depth=1 + worker_id % 2):
+            results.put((worker_id, depth, score, move, pv, tm.nodes))
+    finally:
+        results.put((worker_id, 0, 0.0, 0, [], tm.nodes))
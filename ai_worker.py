@@ -0,0 +1,226 @@
+# ai_worker.py
+# Runs find_best_move in a separate process, so the pygame loop keeps drawing
+# frames and handling events while the engine thinks (and ponders).
+import multiprocessing
+import queue
+import random
+import traceback
+
+from ai_engine import find_best_move
+from bitboard import BitboardGameState
+
+
+class _JobFlag:
+    """Event-like view of a shared job id counter: set once it reaches this
+    job, e.g. when the UI cancels this job (or a later one)."""
+
+    def __init__(self, counter, job_id):
+        self.counter = counter
+        self.job_id = job_id
+
+    def is_set(self):
+        return self.counter.value >= self.job_id
+
+
+def _serve(jobs, results, cancelled, ponderhit, depth, nodes):
+    """Worker process loop: search each (job_id, position, level, ponder) job
+    and send back (job_id, position key, move code, expected reply code), 0
+    meaning none. Ponder jobs ignore the time limits until their ponderhit.
+    Jobs cancelled before they start are skipped. A search that raises is
+    reported on stderr and answered with no move. Exits on None or once the
+    parent process is gone."""
+    parent = multiprocessing.parent_process()
+
+    def report(tm):
+        depth.value = tm.depth
+        nodes.value = tm.nodes
+
+    while True:
+        try:
+            job = jobs.get(timeout=1.0)
+        except queue.Empty:
+            if parent is not None and not parent.is_alive():
+                return
+            continue
+        if job is None:
+            return
+        job_id, gs, level, ponder = job
+        if cancelled.value >= job_id:
+            continue
+        depth.value = 0
+        nodes.value = 0
+        info = {}
+        try:
+            move = find_best_move(gs, level=level, info=info, stop=_JobFlag(cancelled, job_id),
+                                  progress=report,
+                                  ponderhit=_JobFlag(ponderhit, job_id) if ponder else None)
+        except Exception:
+            traceback.print_exc()
+            move = None
+        code = move.code if move is not None else 0
+        pv = info.get("pv", [])
+        reply = pv[1].code if len(pv) > 1 and pv[0].code == code else 0
+        results.put((job_id, gs.zobrist_key, code, reply))
+
+
+class SearchWorker:
+    """One background search process, started on first use and kept for the
+    whole game so its transposition table carries over from move to move.
+
+    start() hands over a snapshot of the position; poll() returns the move
+    code once the search is done. cancel() drops the search in progress (its
+    result is never returned), e.g. after an undo or restart. step() is the
+    game loop's side of it, once per frame.
+
+    On the opponent's turn ponder() searches the position after the reply
+    the last search expected (or, without one, the current position, which
+    only warms the transposition table). opponent_moved() then either turns
+    the ponder search into the real one (the expected reply was played) or
+    cancels it."""
+
+    def __init__(self):
+        self.process = None
+        self.job_id = 0
+        self.pending = 0  # job id of the search in progress, 0 when idle
+        self.expected = 0  # reply code predicted by the last search
+        self.pondering = None  # while pondering: the reply pondered on (0 for all)
+        self.ai_white = None  # the side the AI plays, once known
+
+    def _ensure_started(self):
+        if self.process is not None and self.process.is_alive():
+            return
+        self.jobs = multiprocessing.Queue()
+        self.results = multiprocessing.Queue()
+        self.cancelled = multiprocessing.Value('q', 0)
+        self.ponderhit = multiprocessing.Value('q', 0)
+        self._depth = multiprocessing.Value('i', 0, lock=False)
+        self._nodes = multiprocessing.Value('q', 0, lock=False)
+        # not a daemon: daemonic processes may not start the Lazy SMP helpers
+        self.process = multiprocessing.Process(
+            target=_serve, name="chess-ai",
+            args=(self.jobs, self.results, self.cancelled, self.ponderhit, self._depth, self._nodes))
+        self.process.start()
+
+    @property
+    def thinking(self):
+        return bool(self.pending)
+
+    @property
+    def depth(self):
+        """Depth of the last completed iteration of the search in progress."""
+        return self._depth.value if self.pending else 0
+
+    @property
+    def nodes(self):
+        return self._nodes.value if self.pending else 0
+
+    def _submit(self, gs, level, ponder):
+        self._ensure_started()
+        self.cancel()
+        self.job_id += 1
+        self.pending = self.job_id
+        self._depth.value = 0
+        self._nodes.value = 0
+        self.jobs.put((self.job_id, gs, level, ponder))
+
+    def start(self, gs, level):
+        """Begin searching `gs` (a GameState; it is copied) at `level`."""
+        self.ai_white = gs.whiteToMove
+        self._submit(BitboardGameState.from_gamestate(gs), level, False)
+
+    def ponder(self, gs, level):
+        """Search on the opponent's time; `gs` has the opponent to move.
+        Returns False (and does nothing) when it is the AI's own turn there,
+        as pondering would then wait for a move that never comes."""
+        if self.ai_white == gs.whiteToMove:
+            return False
+        self.ai_white = not gs.whiteToMove
+        snapshot = BitboardGameState.from_gamestate(gs)
+        expected, self.expected = self.expected, 0
+        if expected and expected in snapshot.get_valid_move_codes():
+            snapshot.push(expected)
+        else:
+            expected = 0
+        self._submit(snapshot, level, True)
+        self.pondering = expected
+        return True
+
+    def opponent_moved(self, code):
+        """Report the opponent's move (a move code) to a ponder search."""
+        if self.pondering is None:
+            return
+        if self.pondering and code == self.pondering:
+            # ponderhit: the search goes on as the real one, under the time limits
+            with self.ponderhit.get_lock():
+                self.ponderhit.value = self.pending
+            self.pondering = None
+        else:
+            self.cancel()
+
+    def poll(self, gs):
+        """The move code found by the current search of `gs`, or None while it
+        runs (or if nothing is running, or it is still pondering). A result
+        for another position (by Zobrist key) is dropped, also giving None.
+        0 means the search found no move: the position has none, the search
+        failed, or the process died (the next start() launches a new one)."""
+        if not self.pending or self.pondering is not None:
+            return None
+        while True:
+            try:
+                job_id, key, code, expected = self.results.get_nowait()
+            except queue.Empty:
+                if self.process.is_alive():
+                    return None
+                self.pending = 0
+                self.expected = 0
+                return 0
+            if job_id == self.pending:
+                self.pending = 0
+                if key != gs.zobrist_key:
+                    return None
+                self.expected = expected
+                return code
+
+    def step(self, gs, level, ai_to_move):
+        """One frame of the game loop, called after the frame's events (so
+        moves, undo and restart are already in `gs`). On the AI's turn start a
+        search if none is running and poll it; on the opponent's turn ponder.
+        Returns the Move to play, or None. A code that is not legal in `gs` is
+        replaced by a random legal move."""
+        if gs.checkmate or gs.stalemate:
+            return None
+        if not ai_to_move:
+            if not self.thinking:
+                self.ponder(gs, level)
+            return None
+        if not self.thinking:
+            self.start(gs, level)
+        code = self.poll(gs)
+        if code is None:
+            return None
+        valid_moves = gs.getValidMoves()
+        move = next((m for m in valid_moves if m.code == code), None)
+        if move is None and valid_moves:
+            move = random.choice(valid_moves)
+        return move
+
+    def cancel(self):
+        if self.pending:
+            with self.cancelled.get_lock():
+                self.cancelled.value = self.pending
+            self.pending = 0
+        self.pondering = None
+
+    def close(self):
+        """Stop the search in progress and shut the process down."""
+        if self.process is None:
+            return
+        self.pending = 0
+        self.pondering = None
+        with self.cancelled.get_lock():
+            self.cancelled.value = self.job_id
+        self.jobs.put(None)
+        self.process.join(timeout=2.0)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process = None
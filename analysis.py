@@ -0,0 +1,181 @@
+# analysis.py
+# Batch review of the stored games: every position of every game is searched
+# (fixed depth or fixed nodes) in a pool of worker processes, and per-move
+# scores and blunder flags go back into chess_db. Finished games are recorded,
+# so an interrupted run picks up where it stopped.
+#
+#   python analysis.py                       depth 4 on all cores
+#   python analysis.py --nodes 20000         fixed nodes instead (machine independent)
+#   python analysis.py --workers 2 --limit 100 --db other.db
+import argparse
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import ai_engine
+import chess_db as db
+from ai_engine import MATE_BOUND, MATE_SCORE, TimeManager, iterative_deepening
+from bitboard import BitboardGameState
+from perft import move_to_uci
+
+DEFAULT_DEPTH = 4
+NODES_MAX_DEPTH = 32  # depth cap of fixed-node searches
+PAGE_SIZE = 20  # games read, searched and written back per batch
+# a move losing this much (pawns, mover's view) is flagged as a blunder;
+# scores are capped first, so choosing a slower mate in a won game is not one
+BLUNDER_THRESHOLD = 2.0
+SCORE_CAP = 10.0
+
+# ---------------- worker processes ----------------
+_worker = {}
+
+
+def _init_worker(depth, max_nodes):
+    """Pool initializer: one reusable position and the search settings."""
+    _worker["gs"] = BitboardGameState()
+    _worker["depth"] = depth
+    _worker["max_nodes"] = max_nodes
+
+
+def _search(gs, depth, max_nodes=math.inf):
+    """(score, move code, depth, nodes) of an iterative deepening search, the
+       score from the side to move's view. With no legal move the score is
+       mate or stalemate; it is None if the budget ran out before depth 1."""
+    tt = ai_engine.transposition_table
+    tt.new_search()
+    tm = TimeManager(math.inf, math.inf, max_nodes=max_nodes)
+    result = (None, 0, 0)
+    for reached, score, move, _, _ in iterative_deepening(gs, depth, tm, tt):
+        result = (score, move, reached)
+        if abs(score) >= MATE_BOUND:
+            break
+    if not result[1] and not gs.get_valid_move_codes():
+        result = (-MATE_SCORE if gs.in_check_for_current_player() else 0.0, 0, 0)
+    return result + (tm.nodes,)
+
+
+def analyse_move(task):
+    """Worker: search a packed position (GameState.pack) and the move played
+       there. Returns (best score, best move code, played move score, depth,
+       nodes), scores from white's view (None where the search ran out of
+       budget). The played move is scored by searching its position one ply
+       shallower, so both scores come from the same horizon."""
+    packed, played = task
+    gs = _worker["gs"]
+    gs.set_packed(packed)
+    white = gs.whiteToMove
+    best, move, depth, nodes = _search(gs, _worker["depth"], _worker["max_nodes"])
+    played_score = best
+    if best is not None and played != move:
+        gs.set_packed(packed)  # an aborted search leaves gs mid-line
+        gs.push(played)
+        reply, _, _, reply_nodes = _search(gs, max(1, depth - 1), _worker["max_nodes"])
+        played_score = -reply if reply is not None else None
+        nodes += reply_nodes
+    if not white:
+        best = -best if best is not None else None
+        played_score = -played_score if played_score is not None else None
+    return best, move, played_score, depth, nodes
+
+
+# ---------------- games -> positions -> rows ----------------
+def replay(moves_text):
+    """(SAN moves, move codes, packed positions before each move) of a stored
+       game. Stops at the first move that does not parse."""
+    gs = BitboardGameState()
+    sans = []
+    codes = []
+    packed = []
+    for san in (moves_text or "").split():
+        try:
+            code = gs.parse_san(san).code
+        except ValueError:
+            break
+        sans.append(san)
+        codes.append(code)
+        packed.append(gs.pack())
+        gs.push(code)
+    return sans, codes, packed
+
+
+def _capped(score):
+    return max(-SCORE_CAP, min(SCORE_CAP, score))
+
+
+def move_rows(sans, results, blunder_threshold=BLUNDER_THRESHOLD):
+    """move_analysis rows (without game id) from analyse_move results, one
+       per move of a game."""
+    rows = []
+    for ply, (san, (best, move, played, depth, nodes)) in enumerate(zip(sans, results)):
+        loss = None
+        blunder = 0
+        if best is not None and played is not None:
+            sign = 1 if ply % 2 == 0 else -1  # white moves on even plies
+            loss = max(0.0, sign * (_capped(best) - _capped(played)))
+            blunder = int(loss >= blunder_threshold)
+        rows.append((ply, san, move_to_uci(move) if move else None, best, played, loss, blunder,
+                     depth, nodes))
+    return rows
+
+
+def analyse_games(depth=None, max_nodes=None, workers=None, limit=None,
+                  page_size=PAGE_SIZE, blunder_threshold=BLUNDER_THRESHOLD, report=print):
+    """Analyse the games that have no analysis yet, a page at a time. The
+       positions of a whole page are searched in parallel, then its games are
+       written back in one transaction. Searches stop at `depth` (default
+       DEFAULT_DEPTH, or NODES_MAX_DEPTH with a `max_nodes` budget). Returns
+       the number of games analysed."""
+    db.init_db()
+    workers = workers or os.cpu_count() or 1
+    if depth is None:
+        depth = DEFAULT_DEPTH if max_nodes is None else NODES_MAX_DEPTH
+    done = 0
+    last_id = 0
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(depth, max_nodes or math.inf)) as pool:
+        while limit is None or done < limit:
+            page = db.get_unanalysed_games(last_id, page_size if limit is None else min(page_size, limit - done))
+            if not page:
+                break
+            last_id = page[-1]["id"]
+            games = [(row["id"],) + replay(row["moves"]) for row in page]
+            tasks = [task for _, _, codes, packed in games for task in zip(packed, codes)]
+            results = iter(pool.map(analyse_move, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
+            batch = []
+            for game_id, sans, codes, packed in games:
+                rows = move_rows(sans, [next(results) for _ in codes], blunder_threshold)
+                batch.append((game_id, depth, max_nodes, rows))
+            db.save_game_analyses(batch)
+            done += len(batch)
+            report("%d games analysed (last id %d, %d moves this page, %.0fs)"
+                   % (done, last_id, len(tasks), time.time() - start))
+    return done
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyse the stored games move by move.")
+    parser.add_argument("--db", default=db.DB_FILENAME, help="game database (default %(default)s)")
+    parser.add_argument("--depth", type=int,
+                        help="search depth per position (default %d; with --nodes, a cap)" % DEFAULT_DEPTH)
+    parser.add_argument("--nodes", type=int, help="search a fixed number of nodes per position")
+    parser.add_argument("--workers", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--limit", type=int, help="stop after this many games")
+    parser.add_argument("--page", type=int, default=PAGE_SIZE, help="games per batch (default %(default)s)")
+    parser.add_argument("--blunder", type=float, default=BLUNDER_THRESHOLD,
+                        help="pawns lost that flag a blunder (default %(default)s)")
+    args = parser.parse_args(argv)
+
+    db.DB_FILENAME = args.db
+    try:
+        analyse_games(args.depth, args.nodes, args.workers, args.limit, args.page, args.blunder)
+    except KeyboardInterrupt:
+        print("interrupted; finished games are saved, run again to continue")
+        return 130
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+# batch_eval.py
+# Vectorised evaluation of many positions at once, for offline work such as
+# game review and weight tuning. Needs NumPy, which the game and the search
+# do not: only this module imports it.
+#
+# Positions go in as an (N, 64) int8 array of piece codes (square r * 8 + c,
+# row 0 = rank 8, as in GameState.board) or as (N, 12, 64) int8 piece planes.
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; evaluate_batch says so when called
+    np = None
+
+import ai_engine
+from bitboard import PAWN_ATTACKS
+from piece_tables import MATERIAL, PST
+
+# (N, 64) encoding: 0 empty, 1..6 white pawn, knight, bishop, rook, queen,
+# king; the negatives for black
+PIECE_CODES = {"--": 0}
+for _i, _symbol in enumerate("pNBRQK"):
+    PIECE_CODES["w" + _symbol] = _i + 1
+    PIECE_CODES["b" + _symbol] = -(_i + 1)
+# (N, 12, 64) encoding: one plane per piece, white pawn .. king, then black
+PLANES = ("wp", "wN", "wB", "wR", "wQ", "wK", "bp", "bN", "bB", "bR", "bQ", "bK")
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("batch evaluation needs NumPy (pip install numpy)")
+
+
+def encode(positions):
+    """(N, 64) int8 piece codes for GameStates (or 8x8 boards)."""
+    _require_numpy()
+    boards = [getattr(p, "board", p) for p in positions]
+    return np.array([[PIECE_CODES[piece] for row in board for piece in row] for board in boards],
+                    dtype=np.int8).reshape(len(boards), 64)
+
+
+def to_planes(codes):
+    """(N, 64) piece codes -> (N, 12, 64) piece planes."""
+    _require_numpy()
+    codes = np.asarray(codes)
+    return np.stack([codes == PIECE_CODES[piece] for piece in PLANES], axis=1).astype(np.int8)
+
+
+def from_planes(planes):
+    """(N, 12, 64) piece planes -> (N, 64) piece codes."""
+    _require_numpy()
+    values = np.array([PIECE_CODES[piece] for piece in PLANES], dtype=np.int8)
+    return np.einsum("npq,p->nq", np.asarray(planes, dtype=np.int8), values).astype(np.int8)
+
+
+# ---------------- lookup tables ----------------
+def _mask_matrix(masks):
+    """64 square bitboards -> a (64, 64) 0/1 matrix, row per square."""
+    return np.array([[mask >> sq & 1 for sq in range(64)] for mask in masks], dtype=np.float64)
+
+
+def _pawn_tables():
+    """Per-colour matrices and vectors for the pawn terms of ai_engine.pawn_structure."""
+    tables = {}
+    for color, step in (('w', -8), ('b', 8)):
+        rows = range(1, 7)
+        on_pawn_rows = [(sq >> 3) in rows for sq in range(64)]
+        advance = [(6 - (sq >> 3) if color == 'w' else (sq >> 3) - 1) if on_pawn_rows[sq] else 0
+                   for sq in range(64)]
+        front = ai_engine.FRONT_SPAN[color]
+        tables[color] = {
+            "adjacent": _mask_matrix([ai_engine.ADJACENT_FILES[sq & 7] for sq in range(64)]),
+            "support": _mask_matrix(ai_engine.SUPPORT_SPAN[color]),
+            # enemy pawns hitting the stop square
+            "stop_attackers": _mask_matrix([PAWN_ATTACKS[color][sq + step] if on_pawn_rows[sq] else 0
+                                            for sq in range(64)]),
+            "front": _mask_matrix(front),
+            "file_front": _mask_matrix([front[sq] & ai_engine.FILE_MASKS[sq & 7] for sq in range(64)]),
+            "passed_bonus": np.array([ai_engine.PASSED_PAWN[a] if on_pawn_rows[sq] else 0.0
+                                      for sq, a in enumerate(advance)]),
+        }
+    return tables
+
+
+if np is not None:
+    # score of each piece code on each square: material + piece-square, white's view
+    _PIECE_SQUARE = np.zeros((13, 64))
+    for _piece, _code in PIECE_CODES.items():
+        if _code:
+            _PIECE_SQUARE[_code + 6] = [MATERIAL[_piece] + PST[_piece][sq] for sq in range(64)]
+    _PAWN_TABLES = _pawn_tables()
+
+
+# ---------------- evaluation ----------------
+def _pawn_terms(own, enemy, occupied, color):
+    """Pawn-structure score of one side's pawns (from that side's view), per position."""
+    t = _PAWN_TABLES[color]
+    n = own.shape[0]
+    counts = own.reshape(n, 8, 8).sum(axis=1)
+    score = -ai_engine.DOUBLED_PAWN * np.maximum(counts - 1, 0).sum(axis=1)
+
+    pawn = own > 0
+    isolated = pawn & (own @ t["adjacent"].T == 0)
+    backward = (pawn & ~isolated & (own @ t["support"].T == 0)
+                & (enemy @ t["stop_attackers"].T > 0))
+    passed = pawn & (enemy @ t["front"].T == 0) & (own @ t["file_front"].T == 0)
+    score -= ai_engine.ISOLATED_PAWN * isolated.sum(axis=1)
+    score -= ai_engine.BACKWARD_PAWN * backward.sum(axis=1)
+
+    # passed pawns, with the square ahead occupied costing part of the bonus
+    ahead = np.zeros_like(occupied)
+    if color == 'w':
+        ahead[:, 8:] = occupied[:, :-8]
+    else:
+        ahead[:, :-8] = occupied[:, 8:]
+    bonus = passed * t["passed_bonus"]
+    score += bonus.sum(axis=1) - ai_engine.BLOCKED_PASSED_PAWN * (bonus * ahead).sum(axis=1)
+    return score
+
+
+def evaluate_batch(positions):
+    """evaluate_board without the mobility term (material, piece-square and
+       pawn structure, white's view) for every position of an (N, 64) or
+       (N, 12, 64) int8 array; returns an (N,) float array. Positions are
+       taken as they stand: checkmate and stalemate are not detected."""
+    _require_numpy()
+    codes = np.asarray(positions)
+    if codes.ndim == 3 and codes.shape[1:] == (12, 64):
+        codes = from_planes(codes)
+    elif codes.ndim != 2 or codes.shape[1] != 64:
+        raise ValueError("expected an (N, 64) or (N, 12, 64) array, got shape %s" % (codes.shape,))
+    codes = codes.astype(np.intp)
+
+    score = _PIECE_SQUARE[codes + 6, np.arange(64)].sum(axis=1)
+    white = (codes == 1).astype(np.float64)
+    black = (codes == -1).astype(np.float64)
+    occupied = codes != 0
+    score += _pawn_terms(white, black, occupied, 'w')
+    score -= _pawn_terms(black, white, occupied, 'b')
+    return score
@@ -0,0 +1,196 @@
+# bench.py
+# Search benchmark: fixed-depth iterative deepening over a fixed set of positions.
+#
+#   python bench.py                              depth 4, print a table
+#   python bench.py --depth 5 --json run.json    also save the results
+#   python bench.py --baseline run.json          compare, fail if the search grew past the threshold
+#   python bench.py --baseline run.json --check time   gate on (best-of-N) time instead
+import argparse
+import json
+import math
+import sys
+import time
+
+import ai_engine
+from ai_engine import TimeManager, iterative_deepening
+from bitboard import BitboardGameState
+from perft import move_to_uci
+from transposition import TranspositionTable
+
+# (name, fen): middlegames first, then endgames
+POSITIONS = [
+    ("italian", "r1bqk2r/pppp1ppp/2n2n2/2b1p3/2B1P3/2NP1N2/PPP2PPP/R1BQK2R b KQkq - 0 5"),
+    ("queens gambit", "rnbqkb1r/ppp2ppp/4pn2/3p2B1/2PP4/2N5/PP2PPPP/R2QKBNR b KQkq - 3 4"),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"),
+    ("pinned bishops", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10"),
+    ("open sicilian", "r1bqkb1r/pp2pppp/2np1n2/8/3NP3/2N5/PPP2PPP/R1BQKB1R w KQkq - 2 6"),
+    ("rook endgame", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1"),
+    ("pawn race", "8/5pk1/6p1/8/1P6/8/5PPK/8 w - - 0 1"),
+    ("queen vs rook", "8/8/3k4/8/8/3r4/8/3QK3 w - - 0 1"),
+]
+
+DEFAULT_DEPTH = 4
+DEFAULT_THRESHOLD = 0.10  # allowed total growth (nodes or time) against a baseline
+DEFAULT_REPEAT = 3  # runs per position; the fastest counts
+
+# --enable/--disable names -> ai_engine switches
+FEATURES = {
+    "null-move": "NULL_MOVE_PRUNING",
+    "lmr": "LATE_MOVE_REDUCTIONS",
+    "futility": "FUTILITY_PRUNING",
+    "razoring": "RAZORING",
+    "tablebases": "TABLEBASES",
+}
+
+
+def bench_position(name, fen, depth, tt_mb):
+    """Search one position to `depth` with fresh tables; returns its result dict."""
+    gs = BitboardGameState.from_fen(fen)
+    tt = TranspositionTable(tt_mb)
+    pawns = ai_engine.pawn_hash_table
+    pawns.clear()
+    tm = TimeManager(math.inf, math.inf)
+    iterations = []
+    done = 0        # nodes searched by the completed iterations
+    last = 0        # nodes of the previous iteration alone
+    for d, score, move, _, pv in iterative_deepening(gs, depth, tm, tt):
+        nodes = tm.nodes - done
+        iterations.append({
+            "depth": d,
+            "nodes": tm.nodes,
+            "time": tm.elapsed(),
+            "score": score,
+            "best": move_to_uci(move),
+            "pv": " ".join(move_to_uci(code) for code in pv),
+            # effective branching factor: this iteration's nodes over the previous one's
+            "branching": nodes / last if last else None,
+        })
+        done, last = tm.nodes, nodes
+    elapsed = tm.elapsed()
+    factors = [it["branching"] for it in iterations if it["branching"]]
+    return {
+        "name": name,
+        "fen": fen,
+        "nodes": tm.nodes,
+        "time": elapsed,
+        "nps": tm.nodes / elapsed if elapsed else 0.0,
+        "best": iterations[-1]["best"] if iterations else None,
+        "score": iterations[-1]["score"] if iterations else None,  # side to move's view
+        "pv": iterations[-1]["pv"] if iterations else "",
+        "branching": sum(factors) / len(factors) if factors else None,
+        "pawn_hash_hits": pawns.hit_rate(),
+        "iterations": iterations,
+    }
+
+
+def run(depth, tt_mb, repeat=DEFAULT_REPEAT, names=None):
+    results = []
+    for name, fen in POSITIONS:
+        if names and name not in names:
+            continue
+        # keep the fastest run; node counts are the same every time
+        runs = [bench_position(name, fen, depth, tt_mb) for _ in range(repeat)]
+        results.append(min(runs, key=lambda r: r["time"]))
+    nodes = sum(r["nodes"] for r in results)
+    elapsed = sum(r["time"] for r in results)
+    return {
+        "depth": depth,
+        "tt_mb": tt_mb,
+        "positions": results,
+        "total": {"nodes": nodes, "time": elapsed, "nps": nodes / elapsed if elapsed else 0.0},
+    }
+
+
+def print_report(report):
+    print("%-16s %9s %8s %9s %6s %5s  %-6s %s" % ("position", "nodes", "time", "nps", "ebf", "pawn%",
+                                                  "best", "time to depth"))
+    for r in report["positions"]:
+        to_depth = " ".join("%d:%.2f" % (it["depth"], it["time"]) for it in r["iterations"])
+        ebf = "%.1f" % r["branching"] if r["branching"] else "-"
+        print("%-16s %9d %7.2fs %9.0f %6s %5.1f  %-6s %s" % (r["name"], r["nodes"], r["time"], r["nps"],
+                                                             ebf, 100 * r.get("pawn_hash_hits", 0.0),
+                                                             r["best"], to_depth))
+    total = report["total"]
+    print("total: %d nodes in %.2fs, %.0f nps (depth %d)"
+          % (total["nodes"], total["time"], total["nps"], report["depth"]))
+
+
+def compare(report, baseline, threshold, check="nodes"):
+    """Print per-position changes against `baseline`; True if the total of
+       `check` ("nodes" or "time") is within `threshold` (a fraction) of it.
+       Node counts are the same from run to run, so they make the default
+       gate; wall-clock time varies with the machine's load and is otherwise
+       only reported."""
+    base = {r["name"]: r for r in baseline["positions"]}
+    if baseline.get("depth") != report["depth"]:
+        print("warning: baseline depth %s, this run depth %d" % (baseline.get("depth"), report["depth"]))
+    run_time = base_time = 0.0
+    run_nodes = base_nodes = 0
+    for r in report["positions"]:
+        b = base.get(r["name"])
+        if b is None:
+            print("%-16s not in baseline" % r["name"])
+            continue
+        run_time += r["time"]
+        base_time += b["time"]
+        run_nodes += r["nodes"]
+        base_nodes += b["nodes"]
+        notes = []
+        if r["nodes"] != b["nodes"]:
+            notes.append("nodes %d -> %d" % (b["nodes"], r["nodes"]))
+        if r["best"] != b["best"]:
+            notes.append("best %s -> %s" % (b["best"], r["best"]))
+        change = r["time"] / b["time"] - 1 if b["time"] else 0.0
+        print("%-16s time %+6.1f%%  %s" % (r["name"], change * 100, ", ".join(notes)))
+    growth = {"nodes": run_nodes / base_nodes - 1 if base_nodes else 0.0,
+              "time": run_time / base_time - 1 if base_time else 0.0}
+    ok = growth[check] <= threshold
+    for name in ("nodes", "time"):
+        if name == check:
+            verdict = "(limit %+.1f%%): %s" % (threshold * 100, "ok" if ok else "WORSE")
+        else:
+            verdict = "(not checked)"
+        print("total %-5s %+6.1f%% against baseline %s" % (name, growth[name] * 100, verdict))
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the search on fixed positions.")
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH)
+    parser.add_argument("--tt-mb", type=float, default=ai_engine.TT_SIZE_MB)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help="runs per position; the fastest counts (default %(default)s)")
+    parser.add_argument("--position", action="append", help="only run the named position(s)")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed growth against the baseline, as a fraction")
+    parser.add_argument("--check", choices=("nodes", "time"), default="nodes",
+                        help="what the baseline gate compares (default %(default)s)")
+    parser.add_argument("--enable", action="append", default=[], choices=sorted(FEATURES),
+                        help="switch on a search feature (repeatable)")
+    parser.add_argument("--disable", action="append", default=[], choices=sorted(FEATURES),
+                        help="switch off a search feature (repeatable)")
+    args = parser.parse_args(argv)
+    for name in args.enable:
+        setattr(ai_engine, FEATURES[name], True)
+    for name in args.disable:
+        setattr(ai_engine, FEATURES[name], False)
+
+    report = run(args.depth, args.tt_mb, max(1, args.repeat), args.position)
+    report["date"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    report["features"] = {name: getattr(ai_engine, attr) for name, attr in FEATURES.items()}
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if not compare(report, baseline, args.threshold, args.check):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
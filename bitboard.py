@@ -0,0 +1,691 @@
+# bitboard.py
+from ChessEngine import (CastlingRights, GameState, Move, MoveCache, FLAG_CASTLING,
+                         FLAG_EN_PASSANT, FLAG_PROMOTION, PROMOTION_PIECES)
+from piece_tables import MATERIAL, PST
+from zobrist import PIECE_KEYS, SIDE_KEY, castling_hash, en_passant_hash
+
+# Squares are numbered sq = row * 8 + col, matching GameState.board
+# (row 0 is rank 8, so white pawns move towards lower square numbers).
+PIECES = ("wp", "wN", "wB", "wR", "wQ", "wK",
+          "bp", "bN", "bB", "bR", "bQ", "bK")
+# flag/promotion bits of a promotion move code, queen first
+PROMOTION_BITS = tuple((FLAG_PROMOTION << 14) | (PROMOTION_PIECES.index(p) << 12) for p in "QRBN")
+EN_PASSANT_BITS = FLAG_EN_PASSANT << 14
+CASTLING_BITS = FLAG_CASTLING << 14
+
+# positions whose legal move codes are kept (see get_valid_move_codes)
+CODE_CACHE_SIZE = 4096
+# undo stack slots allocated at a time (plies of game + search)
+UNDO_STACK_BLOCK = 256
+
+# exchange values for see(); the king is priced so it is never given up
+SEE_VALUES = {'p': 1, 'N': 3, 'B': 3, 'R': 5, 'Q': 9, 'K': 100}
+SEE_ORDER = ('p', 'N', 'B', 'R', 'Q', 'K')
+
+# castling right lost when a move starts or ends on one of these squares
+_CASTLING_SQUARES = {63: 'wks', 56: 'wqs', 7: 'bks', 0: 'bqs'}
+
+ROW_MASKS = [0xFF << (8 * r) for r in range(8)]
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+BOARD_MASK = 0xFFFFFFFFFFFFFFFF
+
+# ---------------- precomputed attack tables ----------------
+def _leaper_table(offsets):
+    table = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        bb = 0
+        for dr, dc in offsets:
+            rr, cc = r + dr, c + dc
+            if 0 <= rr <= 7 and 0 <= cc <= 7:
+                bb |= 1 << (rr * 8 + cc)
+        table.append(bb)
+    return table
+
+KNIGHT_ATTACKS = _leaper_table([(-2,-1),(-2,1),(-1,-2),(-1,2),(1,-2),(1,2),(2,-1),(2,1)])
+KING_ATTACKS = _leaper_table([(-1,-1),(-1,0),(-1,1),(0,-1),(0,1),(1,-1),(1,0),(1,1)])
+# squares attacked by a pawn of the given colour standing on sq
+PAWN_ATTACKS = {
+    'w': _leaper_table([(-1,-1),(-1,1)]),
+    'b': _leaper_table([(1,-1),(1,1)]),
+}
+
+# rays exclude the origin square; "positive" directions run towards higher
+# square numbers, so the nearest blocker is the lowest set bit, otherwise the highest
+ROOK_DIRS = [(1,0),(0,1),(-1,0),(0,-1)]
+BISHOP_DIRS = [(1,1),(1,-1),(-1,1),(-1,-1)]
+
+def _ray_table(dr, dc):
+    table = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        bb = 0
+        rr, cc = r + dr, c + dc
+        while 0 <= rr <= 7 and 0 <= cc <= 7:
+            bb |= 1 << (rr * 8 + cc)
+            rr += dr
+            cc += dc
+        table.append(bb)
+    return table
+
+def _is_positive(dr, dc):
+    return dr > 0 or (dr == 0 and dc > 0)
+
+ROOK_RAYS = [(_ray_table(dr, dc), _is_positive(dr, dc)) for dr, dc in ROOK_DIRS]
+BISHOP_RAYS = [(_ray_table(dr, dc), _is_positive(dr, dc)) for dr, dc in BISHOP_DIRS]
+
+def _slider_attacks(sq, occ, rays):
+    attacks = 0
+    for table, positive in rays:
+        ray = table[sq]
+        blockers = ray & occ
+        if blockers:
+            if positive:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            ray ^= table[blocker]
+        attacks |= ray
+    return attacks
+
+def _between_table():
+    """BETWEEN[a][b]: squares strictly between a and b on a shared line, else 0."""
+    table = [[0] * 64 for _ in range(64)]
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        for dr, dc in ROOK_DIRS + BISHOP_DIRS:
+            mask = 0
+            rr, cc = r + dr, c + dc
+            while 0 <= rr <= 7 and 0 <= cc <= 7:
+                table[sq][rr * 8 + cc] = mask
+                mask |= 1 << (rr * 8 + cc)
+                rr += dr
+                cc += dc
+    return table
+
+BETWEEN = _between_table()
+
+def rook_attacks(sq, occ):
+    return _slider_attacks(sq, occ, ROOK_RAYS)
+
+def bishop_attacks(sq, occ):
+    return _slider_attacks(sq, occ, BISHOP_RAYS)
+
+def iter_squares(bb):
+    """Yield the square index of every set bit, lowest first."""
+    while bb:
+        lsb = bb & -bb
+        yield lsb.bit_length() - 1
+        bb ^= lsb
+
+try:
+    popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def popcount(bb):
+        return bin(bb).count("1")
+
+
+class BitboardGameState(GameState):
+    """GameState backed by twelve piece bitboards plus occupancy sets.
+
+    The 8x8 ``board`` list is still kept in sync so the UI, SAN helpers and
+    evaluation can read squares directly, but move generation and attack
+    detection only touch the bitboards."""
+
+    def __init__(self):
+        super().__init__()
+        self._init_bitboards()
+
+    @classmethod
+    def from_gamestate(cls, gs):
+        """Build a bitboard position from any GameState (or copy another one).
+
+        Only the position and its key history are copied, not the move logs,
+        so the copy cannot undo past the position it was made from."""
+        bgs = cls.__new__(cls)
+        bgs.board = [row[:] for row in gs.board]
+        bgs.whiteToMove = gs.whiteToMove
+        bgs.moveLog = []
+        bgs.redoLog = []
+        bgs.whiteKingLocation = gs.whiteKingLocation
+        bgs.blackKingLocation = gs.blackKingLocation
+        bgs.enPassantPossible = gs.enPassantPossible
+        bgs.currentCastlingRights = gs.currentCastlingRights.copy()
+        bgs.castleRightsLog = [bgs.currentCastlingRights.copy()]
+        bgs.enPassantLog = [bgs.enPassantPossible]
+        bgs._push_stack = []
+        bgs.checkmate = gs.checkmate
+        bgs.stalemate = gs.stalemate
+        bgs.move_cache = MoveCache()
+        bgs.hash_log = list(gs.hash_log)
+        bgs.pawn_hash_log = list(gs.pawn_hash_log)
+        bgs.material_score = gs.material_score
+        bgs.pst_score = gs.pst_score
+        bgs._init_bitboards()
+        return bgs
+
+    def set_fen(self, fen):
+        super().set_fen(fen)
+        self._load_bitboards()
+
+    def set_packed(self, data, offset=0):
+        super().set_packed(data, offset)
+        self._load_bitboards()
+
+    def _init_bitboards(self):
+        self.bitboards = {piece: 0 for piece in PIECES}
+        self.occupancy = {'w': 0, 'b': 0}
+        # (code, captured, castling rights, en passant, material, pst) per push;
+        # slots are reused, so the stack only grows past its first block in very long games
+        self._undo_stack = [None] * UNDO_STACK_BLOCK
+        # legal move codes by position key; the search revisits positions on every iteration
+        self.code_cache = MoveCache(CODE_CACHE_SIZE)
+        self._load_bitboards()
+
+    def _load_bitboards(self):
+        """Rebuild the bitboards from `board` in place (after a position load)."""
+        bitboards = self.bitboards
+        occupancy = self.occupancy
+        for piece in PIECES:
+            bitboards[piece] = 0
+        occupancy['w'] = occupancy['b'] = 0
+        for r in range(8):
+            for c, piece in enumerate(self.board[r]):
+                if piece != "--":
+                    bit = 1 << (r * 8 + c)
+                    bitboards[piece] |= bit
+                    occupancy[piece[0]] |= bit
+        self.occupied = occupancy['w'] | occupancy['b']
+        self._undo_top = 0
+
+    # ---------------- square updates (bitboards + mailbox) ----------------
+    def _put(self, piece, sq):
+        bit = 1 << sq
+        self.bitboards[piece] |= bit
+        self.occupancy[piece[0]] |= bit
+        self.occupied |= bit
+        self.board[sq >> 3][sq & 7] = piece
+
+    def _remove(self, piece, sq):
+        mask = ~(1 << sq)
+        self.bitboards[piece] &= mask
+        self.occupancy[piece[0]] &= mask
+        self.occupied &= mask
+        self.board[sq >> 3][sq & 7] = "--"
+
+    # ---------------- Move execution / undo ----------------
+    def push(self, code):
+        """Play a move code. Only position state is updated (no move logs), so
+           this is what the search uses; undo it with pop()."""
+        board = self.board
+        frm, to, flag = code & 63, (code >> 6) & 63, code >> 14
+        piece = board[frm >> 3][frm & 7]
+        color = piece[0]
+        rights = self.currentCastlingRights
+        ep = self.enPassantPossible
+        key = (self.hash_log[-1] ^ SIDE_KEY ^ castling_hash(rights)
+               ^ en_passant_hash(board, ep, self.whiteToMove))
+        pawn_key = self.pawn_hash_log[-1]
+
+        cap_sq = (frm & ~7) | (to & 7) if flag == FLAG_EN_PASSANT else to
+        captured = board[cap_sq >> 3][cap_sq & 7]
+        stack = self._undo_stack
+        top = self._undo_top
+        if top == len(stack):
+            stack.extend([None] * UNDO_STACK_BLOCK)
+        stack[top] = (code, captured, rights, ep, self.material_score, self.pst_score)
+        self._undo_top = top + 1
+
+        material = self.material_score
+        pst = self.pst_score
+        if captured != "--":
+            self._remove(captured, cap_sq)
+            material -= MATERIAL[captured]
+            pst -= PST[captured][cap_sq]
+            key ^= PIECE_KEYS[captured][cap_sq]
+            if captured[1] == 'p':
+                pawn_key ^= PIECE_KEYS[captured][cap_sq]
+        placed = piece
+        if flag == FLAG_PROMOTION:
+            placed = color + PROMOTION_PIECES[(code >> 12) & 3]
+            pawn_key ^= PIECE_KEYS[piece][frm]
+        elif piece[1] == 'p':
+            pawn_key ^= PIECE_KEYS[piece][frm] ^ PIECE_KEYS[piece][to]
+        self._remove(piece, frm)
+        self._put(placed, to)
+        material += MATERIAL[placed] - MATERIAL[piece]
+        pst += PST[placed][to] - PST[piece][frm]
+        key ^= PIECE_KEYS[piece][frm] ^ PIECE_KEYS[placed][to]
+
+        new_ep = ()
+        if piece[1] == 'K':
+            if color == 'w':
+                self.whiteKingLocation = (to >> 3, to & 7)
+            else:
+                self.blackKingLocation = (to >> 3, to & 7)
+            if flag == FLAG_CASTLING:
+                rook = color + 'R'
+                rook_from, rook_to = (to + 1, to - 1) if to > frm else (to - 2, to + 1)
+                self._remove(rook, rook_from)
+                self._put(rook, rook_to)
+                pst += PST[rook][rook_to] - PST[rook][rook_from]
+                key ^= PIECE_KEYS[rook][rook_from] ^ PIECE_KEYS[rook][rook_to]
+        elif piece[1] == 'p' and (frm - to == 16 or to - frm == 16):
+            new_ep = ((frm + to) >> 4, frm & 7)
+
+        # rights are replaced rather than edited, so the stacked object stays valid
+        if piece[1] == 'K' or frm in _CASTLING_SQUARES or to in _CASTLING_SQUARES:
+            lost = {_CASTLING_SQUARES.get(frm), _CASTLING_SQUARES.get(to)}
+            if piece[1] == 'K':
+                lost.update(('wks', 'wqs') if color == 'w' else ('bks', 'bqs'))
+            rights = CastlingRights(rights.wks and 'wks' not in lost, rights.wqs and 'wqs' not in lost,
+                                    rights.bks and 'bks' not in lost, rights.bqs and 'bqs' not in lost)
+            self.currentCastlingRights = rights
+
+        self.enPassantPossible = new_ep
+        self.whiteToMove = not self.whiteToMove
+        self.hash_log.append(key ^ castling_hash(rights)
+                             ^ en_passant_hash(board, new_ep, self.whiteToMove))
+        self.pawn_hash_log.append(pawn_key)
+        self.material_score = material
+        self.pst_score = pst
+        self.checkmate = False
+        self.stalemate = False
+
+    def pop(self):
+        """Take back the last push()."""
+        self._undo_top -= 1
+        code, captured, rights, ep, material, pst = self._undo_stack[self._undo_top]
+        frm, to, flag = code & 63, (code >> 6) & 63, code >> 14
+        placed = self.board[to >> 3][to & 7]
+        color = placed[0]
+        piece = color + 'p' if flag == FLAG_PROMOTION else placed
+        self._remove(placed, to)
+        self._put(piece, frm)
+        if captured != "--":
+            self._put(captured, (frm & ~7) | (to & 7) if flag == FLAG_EN_PASSANT else to)
+        if piece[1] == 'K':
+            if color == 'w':
+                self.whiteKingLocation = (frm >> 3, frm & 7)
+            else:
+                self.blackKingLocation = (frm >> 3, frm & 7)
+            if flag == FLAG_CASTLING:
+                rook = color + 'R'
+                rook_from, rook_to = (to + 1, to - 1) if to > frm else (to - 2, to + 1)
+                self._remove(rook, rook_to)
+                self._put(rook, rook_from)
+
+        self.currentCastlingRights = rights
+        self.enPassantPossible = ep
+        self.whiteToMove = not self.whiteToMove
+        self.hash_log.pop()
+        self.pawn_hash_log.pop()
+        self.material_score = material
+        self.pst_score = pst
+        self.checkmate = False
+        self.stalemate = False
+
+    def push_null(self):
+        """Pass the turn without moving (for null-move pruning); undo it with
+           pop_null(). Never call it while in check."""
+        ep = self.enPassantPossible
+        stack = self._undo_stack
+        top = self._undo_top
+        if top == len(stack):
+            stack.extend([None] * UNDO_STACK_BLOCK)
+        stack[top] = (0, "--", self.currentCastlingRights, ep, self.material_score, self.pst_score)
+        self._undo_top = top + 1
+        self.hash_log.append(self.hash_log[-1] ^ SIDE_KEY
+                             ^ en_passant_hash(self.board, ep, self.whiteToMove))
+        self.enPassantPossible = ()
+        self.whiteToMove = not self.whiteToMove
+
+    def pop_null(self):
+        """Take back the last push_null()."""
+        self._undo_top -= 1
+        self.enPassantPossible = self._undo_stack[self._undo_top][3]
+        self.whiteToMove = not self.whiteToMove
+        self.hash_log.pop()
+
+    def last_move_was_null(self):
+        return self._undo_top > 0 and self._undo_stack[self._undo_top - 1][0] == 0
+
+    def pawn_bitboards(self):
+        return self.bitboards['wp'], self.bitboards['bp']
+
+    def has_non_pawn_material(self):
+        """True if the side to move has a knight, bishop, rook or queen. Without
+           one, zugzwang is common and passing is no safe lower bound."""
+        c = 'w' if self.whiteToMove else 'b'
+        bb = self.bitboards
+        return bool(bb[c + 'N'] | bb[c + 'B'] | bb[c + 'R'] | bb[c + 'Q'])
+
+    # makeMove / undoMove / redoMove come from GameState and land here
+    def _make(self, move):
+        self.push(move.code)
+        self.castleRightsLog.append(self.currentCastlingRights.copy())
+        self.enPassantLog.append(self.enPassantPossible)
+
+    def _unmake(self, move):
+        self.pop()
+        self.castleRightsLog.pop()
+        self.enPassantLog.pop()
+
+    # ---------------- move generation ----------------
+    def get_valid_move_codes(self):
+        """Return legal move codes as a shared, read-only tuple. Checkers and pinned
+           pieces are worked out first, so only check evasions and moves along pin
+           rays are generated; just king moves and en passant need an attack test
+           of their own."""
+        key = self.zobrist_key
+        codes = self.code_cache.get(key)
+        if codes is None:
+            codes = tuple(self._generate_moves(legal=True))
+            self.code_cache.put(key, codes)
+        self._set_end_flags(codes)
+        return codes
+
+    def getValidMoves(self):
+        """Legal moves as a tuple of Move objects, for the UI and SAN code."""
+        key = self.zobrist_key
+        moves = self.move_cache.get(key)
+        if moves is None:
+            board = self.board
+            moves = tuple(Move.from_code(code, board) for code in self.get_valid_move_codes())
+            self.move_cache.put(key, moves)
+        else:
+            self._set_end_flags(moves)
+        return moves
+
+    def get_all_possible_moves(self):
+        """Return pseudo-legal moves for current side (no check filtering)."""
+        board = self.board
+        return [Move.from_code(code, board) for code in self._generate_moves(legal=False)]
+
+    def _checkers_and_pins(self, color, king_sq):
+        """Bitboard of pieces giving check, and {pinned square: allowed targets}."""
+        enemy = 'b' if color == 'w' else 'w'
+        bbs = self.bitboards
+        occ = self.occupied
+        own = self.occupancy[color]
+        checkers = ((PAWN_ATTACKS[color][king_sq] & bbs[enemy + 'p'])
+                    | (KNIGHT_ATTACKS[king_sq] & bbs[enemy + 'N']))
+        pins = {}
+        queens = bbs[enemy + 'Q']
+        for attacks, sliders in ((rook_attacks, bbs[enemy + 'R'] | queens),
+                                 (bishop_attacks, bbs[enemy + 'B'] | queens)):
+            if not sliders:
+                continue
+            direct = attacks(king_sq, occ)
+            checkers |= direct & sliders
+            # x-ray through our own first blockers to find the pinners behind them
+            xray = attacks(king_sq, occ ^ (direct & own))
+            for pinner in iter_squares(xray & ~direct & sliders):
+                line = BETWEEN[king_sq][pinner]
+                pinned = line & own
+                pins[pinned.bit_length() - 1] = line | (1 << pinner)
+        return checkers, pins
+
+    def get_capture_codes(self):
+        """Legal captures (en passant included) and promotions, for quiescence."""
+        return self._generate_moves(legal=True, quiets=False)
+
+    def get_quiet_codes(self):
+        """Legal moves not returned by get_capture_codes (castling included)."""
+        return self._generate_moves(legal=True, captures=False)
+
+    def is_legal(self, code):
+        """True if `code` is a legal move here; for moves remembered from other
+           positions (hash and killer moves)."""
+        frm = code & 63
+        return code in self._generate_moves(legal=True, from_mask=1 << frm)
+
+    def _generate_moves(self, legal, captures=True, quiets=True, from_mask=BOARD_MASK):
+        """Move codes for the side to move; pseudo-legal unless `legal`.
+           `captures` covers captures and promotions, `quiets` every other move;
+           only pieces standing on `from_mask` are moved."""
+        moves = []
+        bbs = self.bitboards
+        color = 'w' if self.whiteToMove else 'b'
+        enemy_color = 'b' if color == 'w' else 'w'
+        own = self.occupancy[color]
+        enemy = self.occupancy[enemy_color]
+        occ = self.occupied
+        empty = ~occ & BOARD_MASK
+        if captures and quiets:
+            targets = ~own & BOARD_MASK
+        else:
+            targets = enemy if captures else empty
+        king_bb = bbs[color + 'K']
+        king_sq = king_bb.bit_length() - 1
+
+        # targets a non-king move must hit: anything, or capture/block a single checker
+        evasion = BOARD_MASK
+        pins = {}
+        checkers = 0
+        if legal:
+            checkers, pins = self._checkers_and_pins(color, king_sq)
+            if checkers:
+                if checkers & (checkers - 1):
+                    evasion = 0  # double check: king moves only
+                else:
+                    evasion = checkers | BETWEEN[king_sq][checkers.bit_length() - 1]
+
+        if evasion:
+            # pawns: pushes set-wise, captures per pawn
+            pawns = bbs[color + 'p'] & from_mask
+            if color == 'w':
+                single = (pawns >> 8) & empty
+                double = ((single & ROW_MASKS[5]) >> 8) & empty
+                step, last_row = 8, ROW_MASKS[0]
+            else:
+                single = (pawns << 8) & empty
+                double = ((single & ROW_MASKS[2]) << 8) & empty
+                step, last_row = -8, ROW_MASKS[7]
+            if not quiets:
+                single &= last_row
+                double = 0
+            elif not captures:
+                single &= ~last_row
+            for to in iter_squares(single & evasion):
+                frm = to + step
+                if frm not in pins or pins[frm] >> to & 1:
+                    self._add_pawn_move(moves, frm, to, last_row)
+            for to in iter_squares(double & evasion):
+                frm = to + 2 * step
+                if frm not in pins or pins[frm] >> to & 1:
+                    moves.append(frm | (to << 6))
+            if captures:
+                ep_bit = 0
+                if self.enPassantPossible:
+                    ep_bit = 1 << (self.enPassantPossible[0] * 8 + self.enPassantPossible[1])
+                pawn_attacks = PAWN_ATTACKS[color]
+                for frm in iter_squares(pawns):
+                    allowed = evasion & pins.get(frm, BOARD_MASK)
+                    for to in iter_squares(pawn_attacks[frm] & enemy & allowed):
+                        self._add_pawn_move(moves, frm, to, last_row)
+                    if pawn_attacks[frm] & ep_bit:
+                        to = ep_bit.bit_length() - 1
+                        if legal:
+                            # the captured pawn leaves its square too, which can expose the king
+                            captured = 1 << (frm // 8 * 8 + to % 8)
+                            after = (occ ^ (1 << frm) ^ captured) | ep_bit
+                            if self._is_attacked(king_sq, enemy_color, after, captured):
+                                continue
+                        moves.append(frm | (to << 6) | EN_PASSANT_BITS)
+
+            for frm in iter_squares(bbs[color + 'N'] & from_mask):
+                if frm in pins:
+                    continue  # a pinned knight can never move
+                for to in iter_squares(KNIGHT_ATTACKS[frm] & targets & evasion):
+                    moves.append(frm | (to << 6))
+            for piece, attacks in ((color + 'B', bishop_attacks), (color + 'R', rook_attacks)):
+                for frm in iter_squares(bbs[piece] & from_mask):
+                    allowed = targets & evasion & pins.get(frm, BOARD_MASK)
+                    for to in iter_squares(attacks(frm, occ) & allowed):
+                        moves.append(frm | (to << 6))
+            for frm in iter_squares(bbs[color + 'Q'] & from_mask):
+                allowed = targets & evasion & pins.get(frm, BOARD_MASK)
+                for to in iter_squares((rook_attacks(frm, occ) | bishop_attacks(frm, occ)) & allowed):
+                    moves.append(frm | (to << 6))
+
+        if king_bb & from_mask:
+            frm = king_sq
+            if legal:
+                # test each target with the king lifted off, so it cannot hide behind itself
+                occ_without_king = occ ^ king_bb
+                for to in iter_squares(KING_ATTACKS[frm] & targets):
+                    if not self._is_attacked(to, enemy_color, occ_without_king, 1 << to):
+                        moves.append(frm | (to << 6))
+            else:
+                for to in iter_squares(KING_ATTACKS[frm] & targets):
+                    moves.append(frm | (to << 6))
+            if quiets and not checkers:
+                self._add_castle_moves(moves, color)
+        return moves
+
+    @staticmethod
+    def _add_pawn_move(moves, frm, to, last_row):
+        code = frm | (to << 6)
+        if last_row >> to & 1:
+            for bits in PROMOTION_BITS:
+                moves.append(code | bits)
+        else:
+            moves.append(code)
+
+    def _add_castle_moves(self, moves, color):
+        rights = self.currentCastlingRights
+        occ = self.occupied
+        if color == 'w':
+            row, enemy = 7, 'b'
+            kingside, queenside = rights.wks, rights.wqs
+        else:
+            row, enemy = 0, 'w'
+            kingside, queenside = rights.bks, rights.bqs
+        base = row * 8
+        if kingside and not occ & (0b11 << (base + 5)):
+            if not any(self._is_attacked(base + c, enemy, occ) for c in (4, 5, 6)):
+                moves.append((base + 4) | ((base + 6) << 6) | CASTLING_BITS)
+        if queenside and not occ & (0b111 << (base + 1)):
+            if not any(self._is_attacked(base + c, enemy, occ) for c in (4, 3, 2)):
+                moves.append((base + 4) | ((base + 2) << 6) | CASTLING_BITS)
+
+    # ---------------- mobility ----------------
+    def count_mobility(self, color):
+        """Pseudo-legal target counts per piece type for `color`, from popcounts
+           of the attack sets."""
+        bbs = self.bitboards
+        occ = self.occupied
+        not_own = ~self.occupancy[color]
+        enemy = self.occupancy['b' if color == 'w' else 'w']
+        empty = ~occ & BOARD_MASK
+
+        pawns = bbs[color + 'p']
+        if color == 'w':
+            single = (pawns >> 8) & empty
+            double = ((single & ROW_MASKS[5]) >> 8) & empty
+            captures = popcount(((pawns & ~FILE_A) >> 9) & enemy) + popcount(((pawns & ~FILE_H) >> 7) & enemy)
+        else:
+            single = (pawns << 8) & empty
+            double = ((single & ROW_MASKS[2]) << 8) & empty
+            captures = popcount(((pawns & ~FILE_A) << 7) & enemy) + popcount(((pawns & ~FILE_H) << 9) & enemy)
+
+        knights = 0
+        for sq in iter_squares(bbs[color + 'N']):
+            knights += popcount(KNIGHT_ATTACKS[sq] & not_own)
+        bishops = 0
+        for sq in iter_squares(bbs[color + 'B']):
+            bishops += popcount(bishop_attacks(sq, occ) & not_own)
+        rooks = 0
+        for sq in iter_squares(bbs[color + 'R']):
+            rooks += popcount(rook_attacks(sq, occ) & not_own)
+        queens = 0
+        for sq in iter_squares(bbs[color + 'Q']):
+            queens += popcount((rook_attacks(sq, occ) | bishop_attacks(sq, occ)) & not_own)
+        king = 0
+        for sq in iter_squares(bbs[color + 'K']):
+            king += popcount(KING_ATTACKS[sq] & not_own)
+        return {'P': popcount(single) + popcount(double) + captures,
+                'N': knights, 'B': bishops, 'R': rooks, 'Q': queens, 'K': king}
+
+    # ---------------- attack detection ----------------
+    def attackers_to(self, sq, occ):
+        """Bitboard of pieces of both colours attacking sq, sliders seen through `occ`."""
+        bbs = self.bitboards
+        queens = bbs['wQ'] | bbs['bQ']
+        return ((PAWN_ATTACKS['b'][sq] & bbs['wp']) | (PAWN_ATTACKS['w'][sq] & bbs['bp'])
+                | (KNIGHT_ATTACKS[sq] & (bbs['wN'] | bbs['bN']))
+                | (KING_ATTACKS[sq] & (bbs['wK'] | bbs['bK']))
+                | (bishop_attacks(sq, occ) & (bbs['wB'] | bbs['bB'] | queens))
+                | (rook_attacks(sq, occ) & (bbs['wR'] | bbs['bR'] | queens)))
+
+    def see(self, code):
+        """Static exchange evaluation of a capture (or promotion) in pawns: the
+           material the side to move ends up with if both sides keep recapturing
+           on the target square with their least valuable piece, and may stop
+           whenever continuing would lose material."""
+        bbs = self.bitboards
+        board = self.board
+        frm, to, flag = code & 63, (code >> 6) & 63, code >> 14
+        color = board[frm >> 3][frm & 7][0]
+        occ = self.occupied ^ (1 << frm)
+        if flag == FLAG_EN_PASSANT:
+            gain = SEE_VALUES['p']
+            occ ^= 1 << ((frm & ~7) | (to & 7))
+        else:
+            victim = board[to >> 3][to & 7]
+            gain = SEE_VALUES[victim[1]] if victim != "--" else 0
+        on_square = SEE_VALUES[board[frm >> 3][frm & 7][1]]
+        if flag == FLAG_PROMOTION:
+            on_square = SEE_VALUES[PROMOTION_PIECES[(code >> 12) & 3]]
+            gain += on_square - SEE_VALUES['p']
+
+        gains = [gain]
+        side = 'b' if color == 'w' else 'w'
+        attackers = self.attackers_to(to, occ) & occ
+        while True:
+            mine = attackers & self.occupancy[side]
+            if not mine:
+                break
+            for kind in SEE_ORDER:
+                bb = mine & bbs[side + kind]
+                if bb:
+                    break
+            other = 'b' if side == 'w' else 'w'
+            if kind == 'K' and attackers & self.occupancy[other]:
+                break  # the king cannot capture into a defended square
+            gains.append(on_square - gains[-1])
+            on_square = SEE_VALUES[kind]
+            occ ^= bb & -bb
+            # sliders behind the piece that just captured join in
+            attackers = self.attackers_to(to, occ) & occ
+            side = other
+        for i in range(len(gains) - 1, 0, -1):
+            gains[i - 1] = -max(-gains[i - 1], gains[i])
+        return gains[0]
+
+    def square_under_attack(self, r, c, by_color=None):
+        attacker = by_color if by_color is not None else ('b' if self.whiteToMove else 'w')
+        return self._is_attacked(r * 8 + c, attacker.lower(), self.occupied)
+
+    def _is_attacked(self, sq, attacker, occ, removed=0):
+        """True if `attacker` hits sq given occupancy `occ`; pieces on `removed`
+           are treated as captured."""
+        bbs = self.bitboards
+        keep = ~removed
+        defender = 'b' if attacker == 'w' else 'w'
+        if PAWN_ATTACKS[defender][sq] & bbs[attacker + 'p'] & keep:
+            return True
+        if KNIGHT_ATTACKS[sq] & bbs[attacker + 'N'] & keep:
+            return True
+        if KING_ATTACKS[sq] & bbs[attacker + 'K']:
+            return True
+        queens = bbs[attacker + 'Q']
+        diag = (bbs[attacker + 'B'] | queens) & keep
+        if diag and bishop_attacks(sq, occ) & diag:
+            return True
+        orth = (bbs[attacker + 'R'] | queens) & keep
+        if orth and rook_attacks(sq, occ) & orth:
+            return True
+        return False
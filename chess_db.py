@@ -30,6 +30,37 @@ CREATE TABLE IF NOT EXISTS games (
 );
 """
 
+# per-move results of analysis.py: the score after the engine's best move and
+# after the move played, in pawns from white's point of view
+CREATE_MOVE_ANALYSIS = """
+CREATE TABLE IF NOT EXISTS move_analysis (
+    game_id INTEGER NOT NULL,
+    ply INTEGER NOT NULL,
+    move TEXT NOT NULL,
+    best_move TEXT,
+    best_score REAL,
+    played_score REAL,
+    loss REAL,
+    blunder INTEGER DEFAULT 0,
+    depth INTEGER,
+    nodes INTEGER,
+    PRIMARY KEY (game_id, ply),
+    FOREIGN KEY(game_id) REFERENCES games(id)
+);
+"""
+
+# games analysis.py has finished with; it skips them when resumed
+CREATE_ANALYSED_GAMES = """
+CREATE TABLE IF NOT EXISTS analysed_games (
+    game_id INTEGER PRIMARY KEY,
+    plies INTEGER,
+    depth INTEGER,
+    max_nodes INTEGER,
+    analysed_at TEXT NOT NULL,
+    FOREIGN KEY(game_id) REFERENCES games(id)
+);
+"""
+
 CREATE_SETTINGS = """
 CREATE TABLE IF NOT EXISTS settings (
     key TEXT PRIMARY KEY,
@@ -48,6 +79,8 @@ def init_db():
     cur.execute(CREATE_PLAYERS)
     cur.execute(CREATE_GAMES)
     cur.execute(CREATE_SETTINGS)
+    cur.execute(CREATE_MOVE_ANALYSIS)
+    cur.execute(CREATE_ANALYSED_GAMES)
     conn.commit()
     conn.close()
 
@@ -130,6 +163,59 @@ def get_recent_games_for_player(name: str, limit: int = 20) -> List[sqlite3.Row]
     conn.close()
     return rows
 
+def get_all_games() -> List[sqlite3.Row]:
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT * FROM games ORDER BY id")
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+# ---------- Game analysis ----------
+def get_unanalysed_games(after_id: int = 0, limit: int = 50) -> List[sqlite3.Row]:
+    """The next `limit` games with an id above `after_id` that have no analysis
+    yet, by id; page through the table by passing the last id seen."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT * FROM games g
+        WHERE g.id > ? AND NOT EXISTS (SELECT 1 FROM analysed_games a WHERE a.game_id = g.id)
+        ORDER BY g.id LIMIT ?
+    """, (after_id, limit))
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+def save_game_analyses(games: List[Tuple[int, int, Optional[int], List[Tuple]]]):
+    """Store the analysis of several games in one transaction. Each game is
+    (game_id, depth, max_nodes, moves), moves being move_analysis rows
+    without the game id: (ply, move, best_move, best_score, played_score,
+    loss, blunder, depth, nodes). A game only counts as analysed once its
+    moves are in, so an interrupted run loses at most this batch."""
+    now = datetime.datetime.utcnow().isoformat()
+    conn = get_connection()
+    with conn:
+        cur = conn.cursor()
+        for game_id, depth, max_nodes, moves in games:
+            cur.executemany("""
+                INSERT OR REPLACE INTO move_analysis
+                    (game_id, ply, move, best_move, best_score, played_score, loss, blunder, depth, nodes)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [(game_id,) + tuple(move) for move in moves])
+            cur.execute("""
+                INSERT OR REPLACE INTO analysed_games (game_id, plies, depth, max_nodes, analysed_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, (game_id, len(moves), depth, max_nodes, now))
+    conn.close()
+
+def get_move_analysis(game_id: int) -> List[sqlite3.Row]:
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT * FROM move_analysis WHERE game_id = ? ORDER BY ply", (game_id,))
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
 # ---------- Settings ----------
 def set_setting(key: str, value: str):
     conn = get_connection()
@@ -2,9 +2,9 @@ import pygame as p
 import sys
 import time
 import ChessEngine
-from ai_engine import find_best_move
+from bitboard import BitboardGameState
+from ai_worker import SearchWorker
 import chess_db as db
-import random
 import copy
 
 # ---------------------- GLOBAL SETTINGS ----------------------
@@ -426,6 +426,17 @@ def get_panel_layout():
     }
 
 
+def draw_thinking(screen, ai):
+    """Live search progress under the panel buttons while the AI thinks (or
+    ponders on the player's time)."""
+    if not ai.thinking:
+        return
+    dots = "." * (1 + (p.time.get_ticks() // 400) % 3)
+    small = p.font.SysFont("Arial", 14)
+    label = "AI pondering" if ai.pondering is not None else "AI thinking"
+    txt = small.render(f"{label}{dots}  depth {ai.depth}  {ai.nodes:,} nodes", True, p.Color("lightgray"))
+    screen.blit(txt, (BOARD_SIZE + 20, HEIGHT - 24))
+
 def draw_panel(screen, san_moves, move_log_shown, font, flip_btn_hover=False):
     L = get_panel_layout()
     # panel background
@@ -666,7 +677,7 @@ def main():
         p.quit(); sys.exit()
 
     # ---------- Game setup ----------
-    gs = ChessEngine.GameState()
+    gs = BitboardGameState()
     valid_moves = gs.getValidMoves()
     move_made = False
     selected_sq = ()
@@ -676,45 +687,51 @@ def main():
     last_move = None
     animate = None
     san_moves = []  # list of SAN strings (alternating white, black)
+    # the AI searches in a background process; the loop polls it every frame
+    ai = SearchWorker()
 
     while running:
         human_turn = (not player_vs_ai) or (gs.whiteToMove != ai_plays_white)
 
         for e in p.event.get():
             if e.type == p.QUIT:
-                running = False; p.quit(); sys.exit()
+                running = False; ai.close(); p.quit(); sys.exit()
 
             # keyboard shortcuts
             elif e.type == p.KEYDOWN:
                 if e.key == p.K_f:
                     flip_board = not flip_board
                 elif e.key == p.K_z:
+                    ai.cancel()
                     gs.undoMove()
                     if san_moves:
                         san_moves.pop()
                     last_move = gs.moveLog[-1] if gs.moveLog else None
                     move_made = True
                 elif e.key == p.K_r:
-                    gs = ChessEngine.GameState()
+                    ai.cancel()
+                    gs = BitboardGameState()
                     valid_moves = gs.getValidMoves(); selected_sq = (); player_clicks = []
                     move_made = False; last_move = None; san_moves = []
                 elif e.key == p.K_m:
                     move_log_shown = not move_log_shown
 
-            # mouse input (only when it's human's turn and not animating)
-            elif e.type == p.MOUSEBUTTONDOWN and human_turn and animate is None:
+            # mouse input (not while animating; board clicks only on the human's turn)
+            elif e.type == p.MOUSEBUTTONDOWN and animate is None:
                 x, y = p.mouse.get_pos()
                 layout = get_panel_layout()
                 if x >= BOARD_SIZE:
                     # Click on panel controls
                     if layout['undo'].collidepoint(x, y):
+                        ai.cancel()
                         gs.undoMove()
                         if san_moves:
                             san_moves.pop()
                         last_move = gs.moveLog[-1] if gs.moveLog else None
                         move_made = True
                     elif layout['restart'].collidepoint(x, y):
-                        gs = ChessEngine.GameState()
+                        ai.cancel()
+                        gs = BitboardGameState()
                         valid_moves = gs.getValidMoves()
                         selected_sq = (); player_clicks = []
                         move_made = False; last_move = None; san_moves = []
@@ -726,7 +743,7 @@ def main():
                         # header click shows stats if name exists
                         if player_name:
                             show_stats_screen(screen, player_name, font)
-                else:
+                elif human_turn:
                     # Click on board. Convert mouse pixel to board coords (game coords)
                     row, col = board_coords_from_mouse(x, y)
                     if selected_sq == (row, col):
@@ -742,6 +759,7 @@ def main():
                                 san_moves.append(san)
                                 animate = (valid, 0.0)
                                 gs.makeMove(valid)
+                                ai.opponent_moved(valid.code)
                                 last_move = valid
                                 move_made = True
                                 selected_sq = (); player_clicks = []
@@ -749,13 +767,12 @@ def main():
                         if not move_made:
                             player_clicks = [selected_sq]
 
-        # --- AI move ---
-        if player_vs_ai and not human_turn and not gs.checkmate and not gs.stalemate and animate is None:
-            ai_move = find_best_move(gs, level=ai_level)
-            if ai_move is None:
-                valid_moves = gs.getValidMoves()
-                if valid_moves:
-                    ai_move = random.choice(valid_moves)
+        # --- AI move (searched in the background; the loop only polls), or
+        # pondering on the human's time ---
+        # whose turn it is comes from gs as it stands after the events above,
+        # which may have moved, undone or restarted
+        if player_vs_ai and animate is None:
+            ai_move = ai.step(gs, ai_level, gs.whiteToMove == ai_plays_white)
             if ai_move:
                 san = move_to_san(ai_move, gs)
                 san_moves.append(san)
@@ -791,6 +808,7 @@ def main():
         layout = get_panel_layout()
         flip_hover = ((mx - layout['flip_center'][0]) ** 2 + (my - layout['flip_center'][1]) ** 2 <= layout['flip_radius'] ** 2) and (BOARD_SIZE <= mx <= WIDTH)
         draw_panel(screen, san_moves, move_log_shown, font, flip_btn_hover=flip_hover)
+        draw_thinking(screen, ai)
 
         # small header
         hdr_font = p.font.SysFont("Arial", 16, True)
@@ -854,6 +872,7 @@ def main():
         p.display.flip()
         clock.tick(MAX_FPS)
 
+    ai.close()
     p.quit()
 
 if __name__ == "__main__":
@@ -0,0 +1,149 @@
+# perft.py
+# Move generator check and benchmark: count leaf nodes of the legal move tree.
+#
+#   python perft.py 4                          start position, depth 4
+#   python perft.py 3 --fen "<fen>" --divide   per-root-move counts
+#   python perft.py --suite --engine mailbox   known positions, compare counts
+import argparse
+import sys
+import time
+
+from ChessEngine import GameState, Move, FLAG_PROMOTION, PROMOTION_PIECES
+from bitboard import BitboardGameState
+
+ENGINES = {"bitboard": BitboardGameState, "mailbox": GameState}
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# (name, fen, known node counts by depth)
+SUITE = [
+    ("start", START_FEN, {1: 20, 2: 400, 3: 8902, 4: 197281, 5: 4865609}),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     {1: 48, 2: 2039, 3: 97862, 4: 4085603}),
+    ("position 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     {1: 14, 2: 191, 3: 2812, 4: 43238, 5: 674624}),
+    ("position 4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     {1: 6, 2: 264, 3: 9467, 4: 422333}),
+    ("position 5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     {1: 44, 2: 1486, 3: 62379, 4: 2103487}),
+    ("position 6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     {1: 46, 2: 2079, 3: 89890, 4: 3894594}),
+    ("ep discovers check", "3k4/3p4/8/K1P4r/8/8/8/8 b - - 0 1",
+     {1: 18, 2: 92, 3: 1670, 4: 10138, 5: 185429, 6: 1134888}),
+    ("ep capture gives check", "8/8/4k3/8/2p5/8/B2P2K1/8 w - - 0 1",
+     {1: 13, 2: 102, 3: 1266, 4: 10276, 5: 135655, 6: 1015133}),
+    ("ep out of check", "8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1",
+     {1: 15, 2: 126, 3: 1928, 4: 13931, 5: 206379, 6: 1440467}),
+    ("short castle gives check", "5k2/8/8/8/8/8/8/4K2R w K - 0 1",
+     {1: 15, 2: 66, 3: 1198, 4: 6399, 5: 120330, 6: 661072}),
+    ("long castle gives check", "3k4/8/8/8/8/8/8/R3K3 w Q - 0 1",
+     {1: 16, 2: 71, 3: 1286, 4: 7418, 5: 141077, 6: 803711}),
+    ("castling rights", "r3k2r/1b4bq/8/8/8/8/7B/R3K2R w KQkq - 0 1",
+     {1: 26, 2: 1141, 3: 27826, 4: 1274206}),
+    ("castling prevented", "r3k2r/8/3Q4/8/8/5q2/8/R3K2R b KQkq - 0 1",
+     {1: 44, 2: 1494, 3: 50509, 4: 1720476}),
+    ("promote out of check", "2K2r2/4P3/8/8/8/8/8/3k4 w - - 0 1",
+     {1: 11, 2: 133, 3: 1442, 4: 19174, 5: 266199, 6: 3821001}),
+    ("discovered check", "8/8/1P2K3/8/2n5/1q6/8/5k2 b - - 0 1",
+     {1: 29, 2: 165, 3: 5160, 4: 31961, 5: 1004658}),
+    ("promote to give check", "4k3/1P6/8/8/8/8/K7/8 w - - 0 1",
+     {1: 9, 2: 40, 3: 472, 4: 2661, 5: 38983, 6: 217342}),
+    ("underpromote to check", "8/P1k5/K7/8/8/8/8/8 w - - 0 1",
+     {1: 6, 2: 27, 3: 273, 4: 1329, 5: 18135, 6: 92683}),
+    ("self stalemate", "K1k5/8/P7/8/8/8/8/8 w - - 0 1",
+     {1: 2, 2: 6, 3: 13, 4: 63, 5: 382, 6: 2217}),
+    ("stalemate and checkmate", "8/k1P5/8/1K6/8/8/8/8 w - - 0 1",
+     {1: 10, 2: 25, 3: 268, 4: 926, 5: 10857, 6: 43261, 7: 567584}),
+    ("double check", "8/8/2k5/5q2/5n2/8/5K2/8 b - - 0 1",
+     {1: 37, 2: 183, 3: 6559, 4: 23527}),
+]
+
+
+def perft(gs, depth):
+    """Leaf nodes of the legal move tree below `gs` at `depth` (bulk-counted at
+       the last ply, so the leaves themselves are never played)."""
+    moves = gs.get_valid_move_codes()
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+    nodes = 0
+    for code in moves:
+        gs.push(code)
+        nodes += perft(gs, depth - 1)
+        gs.pop()
+    return nodes
+
+
+def divide(gs, depth):
+    """[(uci move, nodes)] for every root move."""
+    result = []
+    for code in gs.get_valid_move_codes():
+        gs.push(code)
+        result.append((move_to_uci(code), perft(gs, depth - 1)))
+        gs.pop()
+    return result
+
+
+def move_to_uci(code):
+    start, end = code & 63, (code >> 6) & 63
+    text = (Move.colsToFiles[start & 7] + Move.rowsToRanks[start >> 3]
+            + Move.colsToFiles[end & 7] + Move.rowsToRanks[end >> 3])
+    if code >> 14 == FLAG_PROMOTION:
+        text += PROMOTION_PIECES[(code >> 12) & 3].lower()
+    return text
+
+
+def run_suite(engine, max_nodes):
+    """Check every suite count up to `max_nodes`; returns the number of mismatches."""
+    failures = 0
+    total_nodes = 0
+    start = time.perf_counter()
+    for name, fen, counts in SUITE:
+        gs = engine.from_fen(fen)
+        for depth, expected in sorted(counts.items()):
+            if expected > max_nodes:
+                break
+            nodes = perft(gs, depth)
+            total_nodes += nodes
+            ok = nodes == expected
+            failures += not ok
+            print("%-4s %-26s depth %d  %9d%s" % ("ok" if ok else "FAIL", name, depth, nodes,
+                                                  "" if ok else "  expected %d" % expected))
+    elapsed = time.perf_counter() - start
+    print("%d nodes in %.2fs (%.0f nps), %d failures"
+          % (total_nodes, elapsed, total_nodes / elapsed if elapsed else 0, failures))
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Count legal move tree leaves (perft).")
+    parser.add_argument("depth", nargs="?", type=int, default=3)
+    parser.add_argument("--fen", default=START_FEN)
+    parser.add_argument("--divide", action="store_true", help="print counts per root move")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="bitboard")
+    parser.add_argument("--suite", action="store_true", help="run the known-count suite")
+    parser.add_argument("--max-nodes", type=int, default=100000,
+                        help="suite: skip depths with more nodes than this")
+    args = parser.parse_args(argv)
+    engine = ENGINES[args.engine]
+
+    if args.suite:
+        return 1 if run_suite(engine, args.max_nodes) else 0
+
+    gs = engine.from_fen(args.fen)
+    start = time.perf_counter()
+    if args.divide:
+        rows = divide(gs, args.depth)
+        for uci, nodes in rows:
+            print("%s: %d" % (uci, nodes))
+        nodes = sum(n for _, n in rows)
+        print("moves: %d" % len(rows))
+    else:
+        nodes = perft(gs, args.depth)
+    elapsed = time.perf_counter() - start
+    print("nodes: %d" % nodes)
+    print("time: %.3fs  nps: %.0f" % (elapsed, nodes / elapsed if elapsed else 0))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+# piece_tables.py
+# Material values and piece-square tables, in pawns. Tables are written from
+# white's point of view with row 0 = rank 8, the same layout as GameState.board.
+
+# ---------------------- PIECE VALUES ----------------------
+piece_values = {
+    "K": 0, "Q": 9, "R": 5, "B": 3, "N": 3, "P": 1,
+    "k": 0, "q": 9, "r": 5, "b": 3, "n": 3, "p": 1
+}
+
+# ---------------------- POSITIONAL TABLES ----------------------
+pawn_table = [
+    [0, 0, 0, 0, 0, 0, 0, 0],
+    [5, 5, 5, 5, 5, 5, 5, 5],
+    [1, 1, 2, 3, 3, 2, 1, 1],
+    [0.5, 0.5, 1, 2.5, 2.5, 1, 0.5, 0.5],
+    [0, 0, 0, 2, 2, 0, 0, 0],
+    [0.5, -0.5, -1, 0, 0, -1, -0.5, 0.5],
+    [0.5, 1, 1, -2, -2, 1, 1, 0.5],
+    [0, 0, 0, 0, 0, 0, 0, 0]
+]
+
+knight_table = [
+    [-0.5, -0.4, -0.3, -0.3, -0.3, -0.3, -0.4, -0.5],
+    [-0.4, -0.2, 0, 0, 0, 0, -0.2, -0.4],
+    [-0.3, 0, 0.1, 0.15, 0.15, 0.1, 0, -0.3],
+    [-0.3, 0.05, 0.15, 0.2, 0.2, 0.15, 0.05, -0.3],
+    [-0.3, 0, 0.15, 0.2, 0.2, 0.15, 0, -0.3],
+    [-0.3, 0.05, 0.1, 0.15, 0.15, 0.1, 0.05, -0.3],
+    [-0.4, -0.2, 0, 0.05, 0.05, 0, -0.2, -0.4],
+    [-0.5, -0.4, -0.3, -0.3, -0.3, -0.3, -0.4, -0.5]
+]
+
+bishop_table = [
+    [-0.2, -0.1, -0.1, -0.1, -0.1, -0.1, -0.1, -0.2],
+    [-0.1, 0, 0, 0, 0, 0, 0, -0.1],
+    [-0.1, 0, 0.05, 0.1, 0.1, 0.05, 0, -0.1],
+    [-0.1, 0.05, 0.05, 0.1, 0.1, 0.05, 0.05, -0.1],
+    [-0.1, 0, 0.1, 0.1, 0.1, 0.1, 0, -0.1],
+    [-0.1, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1, -0.1],
+    [-0.1, 0.05, 0, 0, 0, 0, 0.05, -0.1],
+    [-0.2, -0.1, -0.1, -0.1, -0.1, -0.1, -0.1, -0.2]
+]
+
+rook_table = [
+    [0, 0, 0, 0, 0, 0, 0, 0],
+    [0.05, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1, 0.05],
+    [-0.05, 0, 0, 0, 0, 0, 0, -0.05],
+    [-0.05, 0, 0, 0, 0, 0, 0, -0.05],
+    [-0.05, 0, 0, 0, 0, 0, 0, -0.05],
+    [-0.05, 0, 0, 0, 0, 0, 0, -0.05],
+    [-0.05, 0, 0, 0, 0, 0, 0, -0.05],
+    [0, 0, 0, 0.05, 0.05, 0, 0, 0]
+]
+
+queen_table = [
+    [-0.2, -0.1, -0.1, -0.05, -0.05, -0.1, -0.1, -0.2],
+    [-0.1, 0, 0, 0, 0, 0, 0, -0.1],
+    [-0.1, 0, 0.05, 0.05, 0.05, 0.05, 0, -0.1],
+    [-0.05, 0, 0.05, 0.05, 0.05, 0.05, 0, -0.05],
+    [0, 0, 0.05, 0.05, 0.05, 0.05, 0, -0.05],
+    [-0.1, 0.05, 0.05, 0.05, 0.05, 0.05, 0, -0.1],
+    [-0.1, 0, 0.05, 0, 0, 0, 0, -0.1],
+    [-0.2, -0.1, -0.1, -0.05, -0.05, -0.1, -0.1, -0.2]
+]
+
+# middlegame king: stay behind the pawns, preferably castled
+king_table = [
+    [-0.3, -0.4, -0.4, -0.5, -0.5, -0.4, -0.4, -0.3],
+    [-0.3, -0.4, -0.4, -0.5, -0.5, -0.4, -0.4, -0.3],
+    [-0.3, -0.4, -0.4, -0.5, -0.5, -0.4, -0.4, -0.3],
+    [-0.3, -0.4, -0.4, -0.5, -0.5, -0.4, -0.4, -0.3],
+    [-0.2, -0.3, -0.3, -0.4, -0.4, -0.3, -0.3, -0.2],
+    [-0.1, -0.2, -0.2, -0.2, -0.2, -0.2, -0.2, -0.1],
+    [0.2, 0.2, 0, 0, 0, 0, 0.2, 0.2],
+    [0.2, 0.3, 0.1, 0, 0, 0.1, 0.3, 0.2]
+]
+
+piece_square_tables = {
+    "P": pawn_table, "N": knight_table, "B": bishop_table,
+    "R": rook_table, "Q": queen_table, "K": king_table,
+}
+# black uses the same tables mirrored top to bottom
+piece_square_tables.update({k.lower(): v[::-1] for k, v in list(piece_square_tables.items())})
+
+# ---------------------- PER-PIECE LOOKUPS ----------------------
+# Keyed by board strings ('wp', 'bN', ...) and signed from white's point of view,
+# so a position's score is just the sum over its pieces.
+MATERIAL = {}
+PST = {}
+for _color, _sign in (('w', 1), ('b', -1)):
+    for _symbol in "PNBRQK":
+        _piece = _color + ('p' if _symbol == 'P' else _symbol)
+        _table = piece_square_tables[_symbol if _color == 'w' else _symbol.lower()]
+        MATERIAL[_piece] = _sign * piece_values[_symbol]
+        PST[_piece] = [_sign * _table[sq // 8][sq % 8] for sq in range(64)]
+
+
+def board_scores(board):
+    """Full scan: (material, piece-square) totals for a board, white minus black."""
+    material = 0
+    pst = 0
+    for r in range(8):
+        for c in range(8):
+            piece = board[r][c]
+            if piece != "--":
+                material += MATERIAL[piece]
+                pst += PST[piece][r * 8 + c]
+    return material, pst
+
+
+def move_score_delta(move):
+    """(material, piece-square) change caused by `move`, including captures,
+       promotions, en passant and the castling rook."""
+    piece = move.pieceMoved
+    color = piece[0]
+    start = move.startRow * 8 + move.startCol
+    end = move.endRow * 8 + move.endCol
+    placed = piece
+    if piece[1] == 'p' and (move.endRow == 0 or move.endRow == 7):
+        placed = color + (move.promotionChoice or 'Q').upper()
+    material = MATERIAL[placed] - MATERIAL[piece]
+    pst = PST[placed][end] - PST[piece][start]
+    captured = move.pieceCaptured
+    if captured != "--":
+        cap_sq = move.startRow * 8 + move.endCol if move.isEnPassantMove else end
+        material -= MATERIAL[captured]
+        pst -= PST[captured][cap_sq]
+    if move.isCastleMove:
+        rook = PST[color + 'R']
+        row = move.endRow * 8
+        if move.endCol - move.startCol == 2:
+            pst += rook[row + 5] - rook[row + 7]
+        else:
+            pst += rook[row + 3] - rook[row]
+    return material, pst
@@ -0,0 +1,160 @@
+# polyglot.py
+# Polyglot (.bin) opening books: memory-mapped lookup, and a builder that
+# turns the games stored by chess_db into a book.
+#
+#   python polyglot.py book.bin                      build from chess_data.db
+#   python polyglot.py book.bin --max-ply 16 --db other.db
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+
+import chess_db as db
+from ChessEngine import FLAG_CASTLING, FLAG_PROMOTION
+from bitboard import BitboardGameState
+
+# key, move, weight, learn; big-endian, sorted by key
+ENTRY = struct.Struct(">QHHI")
+KEY = struct.Struct(">Q")
+
+DEFAULT_MAX_PLY = 20
+MAX_WEIGHT = 0xFFFF
+
+
+def to_polyglot(code):
+    """Polyglot encoding of a move code: to file, to rank, from file, from
+       rank (3 bits each, rank 0 = rank 1) and promotion piece (1 = knight ...
+       4 = queen). Castling is written as the king capturing its own rook."""
+    frm, to, flag = code & 63, (code >> 6) & 63, code >> 14
+    if flag == FLAG_CASTLING:
+        to = (to & ~7) | (7 if to & 7 == 6 else 0)
+    move = (to & 7) | ((7 - (to >> 3)) << 3) | ((frm & 7) << 6) | ((7 - (frm >> 3)) << 9)
+    if flag == FLAG_PROMOTION:
+        move |= (((code >> 12) & 3) + 1) << 12
+    return move
+
+
+class OpeningBook:
+    """A Polyglot book opened with mmap. Entries are found by binary search on
+    the position key, so only the pages around a probe are ever read."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.count = os.fstat(self.file.fileno()).st_size // ENTRY.size
+        # mmap cannot map an empty file
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.count else None
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+        self.file.close()
+
+    def entries(self, key):
+        """[(polyglot move, weight)] stored for `key`."""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if KEY.unpack_from(self.data, mid * ENTRY.size)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        found = []
+        while lo < self.count:
+            entry_key, move, weight, _ = ENTRY.unpack_from(self.data, lo * ENTRY.size)
+            if entry_key != key:
+                break
+            found.append((move, weight))
+            lo += 1
+        return found
+
+    def moves(self, gs):
+        """[(move code, weight)] of the book moves that are legal in `gs`."""
+        entries = self.entries(gs.zobrist_key)
+        if not entries:
+            return []
+        legal = {to_polyglot(code): code for code in gs.get_valid_move_codes()}
+        return [(legal[move], weight) for move, weight in entries if move in legal and weight]
+
+    def choose(self, gs, mode="weighted", rng=random):
+        """A book move code for `gs`, or 0 when the position is not in the book.
+           "weighted" picks at random in proportion to the weights, "best"
+           always plays the highest weight."""
+        moves = self.moves(gs)
+        if not moves:
+            return 0
+        if mode == "best":
+            return max(moves, key=lambda m: m[1])[0]
+        return rng.choices([code for code, _ in moves], weights=[w for _, w in moves])[0]
+
+
+def game_weights(moves, result):
+    """Weight of each side's moves in one stored game, as (white, black):
+       2 for the winner, 1 each for a draw (or an unknown winner), 0 for the
+       loser. main.py only stores finished games, so a win is the side that
+       gave the final mate."""
+    if result != "draw" and moves and moves[-1].endswith("#"):
+        return (2, 0) if len(moves) % 2 else (0, 2)
+    return 1, 1
+
+
+def build_book(path, games, max_ply=DEFAULT_MAX_PLY):
+    """Write a Polyglot book from `games`, an iterable of (SAN moves string,
+       result). A move's weight in a position sums game_weights over the games
+       that played it there (main.py stores each game once per player, which
+       scales every weight alike). Returns (games used, entries written)."""
+    weights = {}
+    used = 0
+    for moves_text, result in games:
+        sans = moves_text.split()
+        if not sans:
+            continue
+        white, black = game_weights(sans, result)
+        gs = BitboardGameState()
+        for ply, san in enumerate(sans[:max_ply]):
+            try:
+                code = gs.parse_san(san).code
+            except ValueError:
+                break  # unreadable from here on; keep the plies before it
+            key = (gs.zobrist_key, to_polyglot(code))
+            weights[key] = weights.get(key, 0) + (black if ply % 2 else white)
+            gs.push(code)
+        used += 1
+
+    # per position: drop never-winning moves, scale weights into 16 bits
+    by_position = {}
+    for (key, move), weight in weights.items():
+        if weight:
+            by_position.setdefault(key, []).append((move, weight))
+    entries = []
+    for key, moves in by_position.items():
+        top = max(weight for _, weight in moves)
+        scale = MAX_WEIGHT / top if top > MAX_WEIGHT else 1
+        for move, weight in moves:
+            entries.append((key, -weight, move, max(1, int(weight * scale))))
+    entries.sort()
+    with open(path, "wb") as f:
+        for key, _, move, weight in entries:
+            f.write(ENTRY.pack(key, move, weight, 0))
+    return used, len(entries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a Polyglot opening book from stored games.")
+    parser.add_argument("book", help="output .bin file")
+    parser.add_argument("--db", default=db.DB_FILENAME, help="game database (default %(default)s)")
+    parser.add_argument("--max-ply", type=int, default=DEFAULT_MAX_PLY,
+                        help="book only the first plies of each game")
+    args = parser.parse_args(argv)
+
+    db.DB_FILENAME = args.db
+    games = [(row["moves"] or "", row["result"]) for row in db.get_all_games()]
+    used, count = build_book(args.book, games, args.max_ply)
+    print("%d games, %d book entries written to %s" % (used, count, args.book))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
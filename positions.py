@@ -0,0 +1,72 @@
+# positions.py
+# Position files: GameState.pack records (PACKED_SIZE bytes each) back to
+# back, no header. Loading streams them through one reusable GameState.
+#
+#   python positions.py pack suite.fen suite.bin     one FEN per line -> packed file
+#   python positions.py unpack suite.bin             print the positions as FEN
+import argparse
+import sys
+
+from ChessEngine import PACKED_SIZE
+from bitboard import BitboardGameState
+
+READ_CHUNK = 4096  # records per read
+
+
+def write_positions(path, positions):
+    """Write `positions` (GameStates or FEN strings) to `path`; returns the count."""
+    gs = BitboardGameState()
+    count = 0
+    with open(path, "wb") as f:
+        for position in positions:
+            if isinstance(position, str):
+                gs.set_fen(position)
+                position = gs
+            f.write(position.pack())
+            count += 1
+    return count
+
+
+def read_positions(path, gs=None):
+    """Yield every position in file `path`, each loaded into the same GameState
+       `gs` (a new BitboardGameState by default). A yielded position is only
+       valid until the next one; copy it (BitboardGameState.from_gamestate)
+       to keep it. The file is read in chunks into one buffer, so the only
+       per-position work is GameState.set_packed."""
+    gs = BitboardGameState() if gs is None else gs
+    buf = bytearray(PACKED_SIZE * READ_CHUNK)
+    with open(path, "rb") as f:
+        while True:
+            size = f.readinto(buf)
+            if not size:
+                return
+            if size % PACKED_SIZE:
+                raise ValueError("%s: truncated record at the end of the file" % path)
+            for offset in range(0, size, PACKED_SIZE):
+                gs.set_packed(buf, offset)
+                yield gs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert between FEN lists and packed position files.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    pack = commands.add_parser("pack", help="FEN file (one per line) -> packed file")
+    pack.add_argument("fens")
+    pack.add_argument("output")
+    unpack = commands.add_parser("unpack", help="packed file -> FEN on stdout")
+    unpack.add_argument("packed")
+    args = parser.parse_args(argv)
+
+    if args.command == "pack":
+        with open(args.fens) as f:
+            fens = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        count = write_positions(args.output, fens)
+        print("%d positions written to %s" % (count, args.output))
+    else:
+        for gs in read_positions(args.packed):
+            print(gs.to_fen())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
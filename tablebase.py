@@ -0,0 +1,286 @@
+# tablebase.py
+# Distance-to-mate tables for king + queen, rook or pawn against a lone king,
+# built here by retrograde analysis and probed through mmap.
+#
+#   python tablebase.py                  generate KQK, KRK and KPK into tablebases/
+#   python tablebase.py KRK --dir tb     just one table, elsewhere
+import argparse
+import mmap
+import os
+import sys
+import time
+from array import array
+
+from bitboard import popcount
+
+TABLEBASE_DIR = "tablebases"
+SIGNATURES = ("KQK", "KRK", "KPK")  # KPK last: promotions look up KQK and KRK
+
+# Positions are stored with the strong side as white. Index:
+#   side to move (0 strong, 1 weak), strong king (files a-d only: the other
+#   half is the mirror image), weak king, piece; squares are row * 8 + col
+#   with row 0 = rank 8, as in ChessEngine. One byte each: 0 for a draw (or
+#   an impossible position), otherwise 1 + plies to mate. An odd distance is
+#   a win for the side to move, an even one a loss.
+TABLE_SIZE = 2 * 32 * 64 * 64
+
+ROOK_DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+BISHOP_DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+DIRECTIONS = {"Q": ROOK_DIRECTIONS + BISHOP_DIRECTIONS, "R": ROOK_DIRECTIONS}
+
+
+def _king_targets(sq):
+    r, c = sq >> 3, sq & 7
+    return [(r + dr) * 8 + c + dc for dr in (-1, 0, 1) for dc in (-1, 0, 1)
+            if (dr or dc) and 0 <= r + dr < 8 and 0 <= c + dc < 8]
+
+
+def _rays(sq, directions):
+    rays = []
+    for dr, dc in directions:
+        r, c = (sq >> 3) + dr, (sq & 7) + dc
+        ray = []
+        while 0 <= r < 8 and 0 <= c < 8:
+            ray.append(r * 8 + c)
+            r, c = r + dr, c + dc
+        rays.append(ray)
+    return rays
+
+
+KING_TARGETS = [_king_targets(sq) for sq in range(64)]
+KING_MASK = [sum(1 << t for t in KING_TARGETS[sq]) for sq in range(64)]
+RAYS = {kind: [_rays(sq, dirs) for sq in range(64)] for kind, dirs in DIRECTIONS.items()}
+
+
+def table_index(weak_to_move, strong_king, weak_king, piece):
+    """Index of a position whose strong king is already on files a-d."""
+    return (((weak_to_move << 5) | ((strong_king >> 3) << 2) | (strong_king & 7)) << 12
+            | (weak_king << 6) | piece)
+
+
+def _canonical(weak_to_move, strong_king, weak_king, piece):
+    if strong_king & 7 >= 4:
+        strong_king, weak_king, piece = strong_king ^ 7, weak_king ^ 7, piece ^ 7
+    return table_index(weak_to_move, strong_king, weak_king, piece)
+
+
+def _attacks(kind, piece, occupied):
+    """Squares the strong side's piece attacks, given the occupied squares."""
+    if kind == "P":
+        r, c = piece >> 3, piece & 7
+        return sum(1 << (r - 1) * 8 + c + dc for dc in (-1, 1) if 0 <= c + dc < 8)
+    mask = 0
+    for ray in RAYS[kind][piece]:
+        for t in ray:
+            mask |= 1 << t
+            if occupied >> t & 1:
+                break
+    return mask
+
+
+# ---------------- generation ----------------
+def generate(kind, directory=TABLEBASE_DIR):
+    """Build the K + `kind` vs K table by retrograde analysis and write it to
+       `directory`. KPK needs the KQK and KRK files there already."""
+    promotions = {}
+    if kind == "P":
+        for piece in "QR":
+            with open(table_path("K%sK" % piece, directory), "rb") as f:
+                promotions[piece] = f.read()
+
+    # successors of every position, as flat arrays (index -> targets)
+    starts = array('i', bytes(4 * (TABLE_SIZE + 1)))
+    targets = array('i')
+    moves_left = array('i', bytes(4 * TABLE_SIZE))  # weak side: moves not yet known to lose
+    buckets = {0: []}  # plies to mate -> positions that may have it
+    for idx in range(TABLE_SIZE):
+        starts[idx] = len(targets)
+        weak_to_move, rest = idx >> 17, idx & 0x1FFFF
+        sk = ((rest >> 14) << 3) | ((rest >> 12) & 3)
+        wk, piece = (rest >> 6) & 63, rest & 63
+        if sk == wk or sk == piece or wk == piece or KING_MASK[sk] >> wk & 1:
+            continue
+        if kind == "P" and piece >> 3 in (0, 7):
+            continue
+        occupied = (1 << sk) | (1 << wk) | (1 << piece)
+        if not weak_to_move:
+            if _attacks(kind, piece, occupied) >> wk & 1:
+                continue  # the weak king is in check with the strong side to move
+            for t in KING_TARGETS[sk]:
+                if t != piece and not KING_MASK[wk] >> t & 1:
+                    targets.append(_canonical(1, t, wk, piece))
+            if kind == "P":
+                push = piece - 8
+                if push not in (sk, wk):
+                    if push < 8:
+                        # promotion: only a queen or rook can still win
+                        best = min((promotions[p][table_index(1, sk, wk, push)] or 256) for p in "QR")
+                        if best < 256:
+                            buckets.setdefault(best, []).append(idx)  # win in (best - 1) + 1 plies
+                    else:
+                        targets.append(table_index(1, sk, wk, push))
+                        if piece >> 3 == 6 and push - 8 not in (sk, wk):
+                            targets.append(table_index(1, sk, wk, push - 8))
+            else:
+                attacked = _attacks(kind, piece, occupied)
+                attacked &= ~((1 << sk) | (1 << wk))
+                while attacked:
+                    t = (attacked & -attacked).bit_length() - 1
+                    attacked &= attacked - 1
+                    targets.append(table_index(1, sk, wk, t))
+        else:
+            guarded = _attacks(kind, piece, occupied & ~(1 << wk)) | KING_MASK[sk]
+            count = 0
+            for t in KING_TARGETS[wk]:
+                if guarded >> t & 1:
+                    continue
+                if t == piece:
+                    count += 1  # takes the undefended piece: a draw, so never counted down
+                    continue
+                targets.append(table_index(0, sk, t, piece))
+                count += 1
+            moves_left[idx] = count
+            if not count and guarded >> wk & 1:
+                buckets[0].append(idx)  # checkmated
+    starts[TABLE_SIZE] = len(targets)
+
+    # predecessors: invert the successor arrays
+    pred_starts = array('i', bytes(4 * (TABLE_SIZE + 1)))
+    for t in targets:
+        pred_starts[t + 1] += 1
+    for idx in range(TABLE_SIZE):
+        pred_starts[idx + 1] += pred_starts[idx]
+    fill = array('i', pred_starts)
+    preds = array('i', bytes(4 * len(targets)))
+    for idx in range(TABLE_SIZE):
+        for k in range(starts[idx], starts[idx + 1]):
+            t = targets[k]
+            preds[fill[t]] = idx
+            fill[t] += 1
+
+    # breadth first from the mates: a position gets its distance the first
+    # time it is reached, so strong-side wins are as short as possible and
+    # weak-side losses as long as possible
+    values = bytearray(TABLE_SIZE)
+    plies = 0
+    while plies <= max(buckets):
+        for idx in buckets.get(plies, ()):
+            if values[idx]:
+                continue
+            values[idx] = plies + 1
+            for k in range(pred_starts[idx], pred_starts[idx + 1]):
+                pred = preds[k]
+                if values[pred]:
+                    continue
+                if plies % 2 == 0:
+                    buckets.setdefault(plies + 1, []).append(pred)
+                else:
+                    moves_left[pred] -= 1
+                    if not moves_left[pred]:
+                        buckets.setdefault(plies + 1, []).append(pred)
+        plies += 1
+
+    os.makedirs(directory, exist_ok=True)
+    with open(table_path("K%sK" % kind, directory), "wb") as f:
+        f.write(values)
+    return values
+
+
+def table_path(signature, directory=TABLEBASE_DIR):
+    return os.path.join(directory, signature + ".tb")
+
+
+# ---------------- probing ----------------
+_tables = {}
+
+
+def _table(signature):
+    """The mmap of a table file, opened on first use; None if not generated."""
+    if signature not in _tables:
+        path = table_path(signature, TABLEBASE_DIR)
+        table = None
+        if os.path.exists(path) and os.path.getsize(path) == TABLE_SIZE:
+            with open(path, "rb") as f:
+                table = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        _tables[signature] = table
+    return _tables[signature]
+
+
+def probe(gs):
+    """(result, plies to mate) for the side to move in a BitboardGameState
+       with at most three men: result 1 win, -1 loss, 0 draw. None when no
+       table covers the position (too many men, castling rights, or the
+       table has not been generated)."""
+    men = popcount(gs.occupied)
+    if men > 3:
+        return None
+    if men == 2:
+        return 0, 0
+    rights = gs.currentCastlingRights
+    if rights.wks or rights.wqs or rights.bks or rights.bqs:
+        return None
+    bitboards = gs.bitboards
+    for piece in ("wQ", "wR", "wp", "bQ", "bR", "bp", "wN", "wB", "bN", "bB"):
+        if bitboards[piece]:
+            break
+    if piece[1] in "NB":
+        return 0, 0  # a lone minor piece cannot mate
+    table = _table("K%sK" % piece[1].upper())
+    if table is None:
+        return None
+    sq = bitboards[piece].bit_length() - 1
+    sk = bitboards[piece[0] + "K"].bit_length() - 1
+    wk = bitboards[("b" if piece[0] == "w" else "w") + "K"].bit_length() - 1
+    weak_to_move = gs.whiteToMove != (piece[0] == "w")
+    if piece[0] == "b":
+        # black is the strong side: flip the board so it plays up as white
+        sq, sk, wk = sq ^ 56, sk ^ 56, wk ^ 56
+    value = table[_canonical(weak_to_move, sk, wk, sq)]
+    if not value:
+        return 0, 0
+    return (1 if (value - 1) % 2 else -1), value - 1
+
+
+def best_move(gs):
+    """(move code, result) of the best move in a position the tables cover,
+       result as for probe(): the quickest win, else a draw, else the slowest
+       loss. None when the position (or one of its moves) is not covered, or
+       there is no legal move."""
+    if probe(gs) is None:
+        return None
+    best = None
+    for code in gs.get_valid_move_codes():
+        gs.push(code)
+        result = probe(gs)
+        gs.pop()
+        if result is None:
+            return None
+        reply, plies = result
+        rank = -reply * (1000 - plies) if reply else 0
+        if best is None or rank > best[0]:
+            best = (rank, code, (-reply, plies + 1) if reply else (0, 0))
+    return None if best is None else best[1:]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate endgame tablebases by retrograde analysis.")
+    parser.add_argument("tables", nargs="*", metavar="TABLE", help="any of %s (default all)" % ", ".join(SIGNATURES))
+    parser.add_argument("--dir", default=TABLEBASE_DIR, help="output directory (default %(default)s)")
+    args = parser.parse_args(argv)
+    wanted = set(args.tables or SIGNATURES)
+    if wanted - set(SIGNATURES):
+        parser.error("unknown table: %s" % ", ".join(sorted(wanted - set(SIGNATURES))))
+    for signature in SIGNATURES:
+        if signature not in wanted:
+            continue
+        start = time.perf_counter()
+        values = generate(signature[1], args.dir)
+        wins = sum(1 for v in values[:TABLE_SIZE // 2] if v)
+        longest = max(values) - 1 if any(values) else 0
+        print("%s: %d winning positions with the strong side to move, longest mate %d plies (%.1fs)"
+              % (signature, wins, longest, time.perf_counter() - start))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
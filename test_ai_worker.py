@@ -0,0 +1,154 @@
+# test_ai_worker.py
+# The game loop's use of SearchWorker, driven the way main.py drives it but
+# without pygame: each frame handles its events first, then calls step().
+import time
+
+import pytest
+
+import ai_worker
+from ai_worker import SearchWorker
+from bitboard import BitboardGameState
+
+LEVEL = "beginner"
+TIMEOUT = 30.0  # seconds a test waits for the AI to move
+
+
+class Game:
+    """gs, the worker and the events of main.py's loop."""
+
+    def __init__(self, ai_plays_white=False, level=LEVEL):
+        self.gs = BitboardGameState()
+        self.ai = SearchWorker()
+        self.ai_plays_white = ai_plays_white
+        self.level = level
+
+    def frame(self):
+        move = self.ai.step(self.gs, self.level, self.gs.whiteToMove == self.ai_plays_white)
+        if move:
+            self.gs.makeMove(move)
+        return move
+
+    def play_human(self, notation):
+        move = next(m for m in self.gs.getValidMoves()
+                    if notation in (m.getChessNotation(), m.code))
+        self.gs.makeMove(move)
+        self.ai.opponent_moved(move.code)
+
+    def undo(self):
+        self.ai.cancel()
+        self.gs.undoMove()
+
+    def restart(self):
+        self.ai.cancel()
+        self.gs = BitboardGameState()
+
+    def wait_for_ai(self):
+        deadline = time.time() + TIMEOUT
+        while time.time() < deadline:
+            before = BitboardGameState.from_gamestate(self.gs)
+            move = self.frame()
+            if move:
+                assert move.code in before.get_valid_move_codes()
+                return move
+            time.sleep(0.01)
+        pytest.fail("the AI did not move")
+
+
+@pytest.fixture
+def game():
+    game = Game()
+    yield game
+    game.ai.close()
+
+
+def test_ai_answers_a_move(game):
+    game.play_human("e2e4")
+    game.wait_for_ai()
+    assert game.gs.whiteToMove
+
+
+def test_undo_while_thinking_ponders_on_the_human_turn(game):
+    game.play_human("e2e4")
+    game.frame()
+    assert game.ai.thinking and game.ai.pondering is None
+    game.undo()
+    assert game.frame() is None
+    assert game.ai.pondering == 0
+    game.play_human("d2d4")
+    game.wait_for_ai()
+    assert game.gs.whiteToMove
+
+
+def test_restart_while_thinking(game):
+    game.play_human("e2e4")
+    game.frame()
+    game.restart()
+    assert game.frame() is None
+    assert game.ai.pondering == 0
+    game.play_human("g1f3")
+    game.wait_for_ai()
+
+
+def test_result_for_another_position_is_dropped(game):
+    game.ai.start(game.gs, LEVEL)
+    other = BitboardGameState()
+    other.makeMove(other.getValidMoves()[0])
+    deadline = time.time() + TIMEOUT
+    while game.ai.thinking and time.time() < deadline:
+        assert game.ai.poll(other) is None
+        time.sleep(0.01)
+    assert not game.ai.thinking
+
+
+def test_failed_search_falls_back_to_a_legal_move(game, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("search failed")
+
+    # the worker process is forked on first use, so it inherits the patch
+    monkeypatch.setattr(ai_worker, "find_best_move", broken)
+    game.play_human("e2e4")
+    game.wait_for_ai()
+    assert game.ai.process.is_alive()
+
+
+def test_dead_search_process_is_replaced(game):
+    game.play_human("e2e4")
+    game.frame()
+    game.ai.process.kill()
+    game.ai.process.join()
+    game.wait_for_ai()
+    game.play_human("d2d4")
+    game.wait_for_ai()
+
+
+def test_ponder_miss_then_ai_moves(game):
+    # nothing predicted yet: the first ponder search is on the current
+    # position, so the human's first move is always a miss
+    game.frame()
+    assert game.ai.pondering == 0
+    game.play_human("e2e4")
+    assert not game.ai.thinking
+    game.wait_for_ai()
+
+
+def test_ponderhit_continues_the_search(game):
+    # "beginner" sometimes plays a random move, which comes with no prediction
+    game.level = "intermediate"
+    game.play_human("e2e4")
+    game.wait_for_ai()
+    game.frame()
+    expected = game.ai.pondering
+    assert expected is not None
+    if not expected:
+        pytest.skip("the search predicted no reply")
+    game.play_human(expected)
+    assert game.ai.thinking and game.ai.pondering is None
+    game.wait_for_ai()
+
+
+def test_ponder_refuses_the_ai_turn(game):
+    game.play_human("e2e4")
+    game.frame()
+    game.ai.cancel()
+    assert game.ai.ponder(game.gs, LEVEL) is False
+    assert not game.ai.thinking
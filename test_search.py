@@ -0,0 +1,42 @@
+# test_search.py
+# Search results on positions whose answer is known.
+import math
+
+import ai_engine
+from ai_engine import MATE_BOUND, MATE_SCORE, TimeManager, find_best_move, iterative_deepening
+from bitboard import BitboardGameState
+
+MATED = "rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3"  # fool's mate
+STALEMATE = "7k/5Q2/6K1/8/8/8/8/8 b - - 0 1"
+MATE_IN_ONE = "6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1"  # Ra8#
+MATE_IN_TWO = "k7/8/2K5/8/8/8/8/7R w - - 0 1"  # 1. Kb6 Kb8 2. Rh8#
+
+
+def test_mated_root_has_no_move():
+    assert find_best_move(BitboardGameState.from_fen(MATED)) is None
+
+
+def test_stalemated_root_has_no_move():
+    assert find_best_move(BitboardGameState.from_fen(STALEMATE)) is None
+
+
+def test_iterative_deepening_without_legal_moves_yields_nothing():
+    for fen in (MATED, STALEMATE):
+        tm = TimeManager(math.inf, math.inf)
+        assert list(iterative_deepening(BitboardGameState.from_fen(fen), 4, tm)) == []
+
+
+def test_mate_in_one_scores_one_ply():
+    info = {}
+    move = find_best_move(BitboardGameState.from_fen(MATE_IN_ONE), tt=ai_engine.TranspositionTable(1),
+                          info=info)
+    assert move.getChessNotation() == "a1a8"
+    assert info["score"] == MATE_SCORE - 1
+
+
+def test_quicker_mate_scores_higher():
+    gs = BitboardGameState.from_fen(MATE_IN_TWO)
+    tm = TimeManager(math.inf, math.inf)
+    scores = [score for _, score, _, _, _ in iterative_deepening(gs, 4, tm, ai_engine.TranspositionTable(1))]
+    assert scores[-1] == MATE_SCORE - 3
+    assert scores[-1] >= MATE_BOUND
@@ -0,0 +1,222 @@
+# transposition.py
+import struct
+from array import array
+from multiprocessing import shared_memory
+
+# bound types stored with each score
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# key (8 bytes) + score (8 bytes) + packed move/depth/bound/generation (8 bytes);
+# moves are the 16-bit codes from ChessEngine.encode_move
+ENTRY_BYTES = 24
+BUCKET_SIZE = 2  # slot 0: depth-preferred, slot 1: always-replace
+
+# pawn hash: key + score + white and black passed-pawn masks
+PAWN_ENTRY_BYTES = 32
+
+# score <-> its 64-bit pattern, for the shared table's integer-only slots
+_DOUBLE = struct.Struct('d')
+_QWORD = struct.Struct('Q')
+
+
+class TranspositionTable:
+    """Fixed-size table of search results keyed by Zobrist key.
+
+    Storage is three flat arrays allocated up front, so memory stays at
+    `size_mb` no matter how long the engine runs. Each bucket has a
+    depth-preferred slot and an always-replace slot."""
+
+    def __init__(self, size_mb=16):
+        self.num_buckets = max(1, int(size_mb * 1024 * 1024) // (ENTRY_BYTES * BUCKET_SIZE))
+        slots = self.num_buckets * BUCKET_SIZE
+        self.keys = array('Q', bytes(8 * slots))
+        self.scores = array('d', bytes(8 * slots))
+        # move | depth << 16 | bound << 24 | generation << 26 | used << 32
+        self.info = array('Q', bytes(8 * slots))
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+
+    def clear(self):
+        slots = self.num_buckets * BUCKET_SIZE
+        self.keys = array('Q', bytes(8 * slots))
+        self.scores = array('d', bytes(8 * slots))
+        self.info = array('Q', bytes(8 * slots))
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+
+    def new_search(self):
+        """Age existing entries so the next search prefers replacing them."""
+        self.generation = (self.generation + 1) & 0x3F
+
+    def probe(self, key):
+        """Return (depth, score, bound, move_code) for key, or None."""
+        self.probes += 1
+        i = (key % self.num_buckets) * BUCKET_SIZE
+        keys = self.keys
+        for slot in (i, i + 1):
+            if keys[slot] == key:
+                info = self.info[slot]
+                if info >> 32:
+                    self.hits += 1
+                    return ((info >> 16) & 0xFF, self.scores[slot],
+                            (info >> 24) & 0x3, info & 0xFFFF)
+        return None
+
+    def store(self, key, depth, score, bound, move_code=0):
+        i = (key % self.num_buckets) * BUCKET_SIZE
+        keys = self.keys
+        info = self.info
+        if keys[i + 1] == key:
+            slot = i + 1
+        elif keys[i] == key or not info[i] >> 32:
+            slot = i
+        else:
+            old = info[i]
+            stale = ((old >> 26) & 0x3F) != self.generation
+            slot = i if stale or depth >= ((old >> 16) & 0xFF) else i + 1
+        if not move_code and keys[slot] == key:
+            # keep the previous best move when this result has none
+            move_code = info[slot] & 0xFFFF
+        keys[slot] = key
+        self.scores[slot] = score
+        info[slot] = (move_code | (min(depth, 0xFF) << 16) | (bound << 24)
+                      | (self.generation << 26) | (1 << 32))
+
+    def hashfull(self):
+        """Per-mille of sampled slots written during the current search."""
+        sample = min(1000, len(self.info))
+        used = sum(1 for s in range(sample)
+                   if self.info[s] >> 32 and ((self.info[s] >> 26) & 0x3F) == self.generation)
+        return used * 1000 // sample
+
+
+class PawnHashTable:
+    """Pawn-structure results keyed by the pawn-only Zobrist key
+    (GameState.pawn_key): the score and both sides' passed-pawn masks.
+
+    Pawns move rarely compared with the pieces, so nearly every probe in a
+    search hits; one always-replace entry per slot is enough. A position
+    without pawns has key 0 and matches an empty slot, whose zero score and
+    masks are also the right answer."""
+
+    def __init__(self, size_kb=512):
+        self.size = max(1, size_kb * 1024 // PAWN_ENTRY_BYTES)
+        self.clear()
+
+    def clear(self):
+        self.keys = array('Q', bytes(8 * self.size))
+        self.scores = array('d', bytes(8 * self.size))
+        self.white_passed = array('Q', bytes(8 * self.size))
+        self.black_passed = array('Q', bytes(8 * self.size))
+        self.probes = 0
+        self.hits = 0
+
+    def probe(self, key):
+        """Return (score, white passed pawns, black passed pawns) for key, or None."""
+        self.probes += 1
+        i = key % self.size
+        if self.keys[i] == key:
+            self.hits += 1
+            return self.scores[i], self.white_passed[i], self.black_passed[i]
+        return None
+
+    def store(self, key, score, white_passed, black_passed):
+        i = key % self.size
+        self.keys[i] = key
+        self.scores[i] = score
+        self.white_passed[i] = white_passed
+        self.black_passed[i] = black_passed
+
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """TranspositionTable in a multiprocessing.shared_memory block, so search
+    processes on one machine share results (Lazy SMP).
+
+    There are no locks: two processes may write the same slot at once and tear
+    the entry. Each slot therefore stores key ^ info ^ score bits in place of
+    the key, and a probe only accepts the slot if that checks out, so a torn
+    entry just reads as a miss. Pickling (for spawned processes) sends only the
+    block name; the receiver attaches to the same memory."""
+
+    def __init__(self, size_mb=16, name=None):
+        self.num_buckets = max(1, int(size_mb * 1024 * 1024) // (ENTRY_BYTES * BUCKET_SIZE))
+        size = self.num_buckets * BUCKET_SIZE * ENTRY_BYTES
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        self._attach()
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+
+    def _attach(self):
+        part = self.num_buckets * BUCKET_SIZE * 8
+        buf = self.shm.buf
+        self.keys = buf[:part].cast('Q')
+        self.scores = buf[part:2 * part].cast('Q')  # bit patterns of the float scores
+        self.info = buf[2 * part:3 * part].cast('Q')
+
+    def __getstate__(self):
+        return {"name": self.shm.name, "num_buckets": self.num_buckets, "generation": self.generation}
+
+    def __setstate__(self, state):
+        self.num_buckets = state["num_buckets"]
+        self.owner = False
+        self.shm = shared_memory.SharedMemory(name=state["name"])
+        self._attach()
+        self.generation = state["generation"]
+        self.probes = 0
+        self.hits = 0
+
+    def close(self):
+        """Detach from the block; the process that created it also frees it."""
+        for view in (self.keys, self.scores, self.info):
+            view.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def clear(self):
+        size = self.num_buckets * BUCKET_SIZE * ENTRY_BYTES
+        self.shm.buf[:size] = bytes(size)
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+
+    def probe(self, key):
+        self.probes += 1
+        i = (key % self.num_buckets) * BUCKET_SIZE
+        for slot in (i, i + 1):
+            info = self.info[slot]
+            bits = self.scores[slot]
+            if self.keys[slot] ^ info ^ bits == key and info >> 32:
+                self.hits += 1
+                return ((info >> 16) & 0xFF, _DOUBLE.unpack(_QWORD.pack(bits))[0],
+                        (info >> 24) & 0x3, info & 0xFFFF)
+        return None
+
+    def store(self, key, depth, score, bound, move_code=0):
+        i = (key % self.num_buckets) * BUCKET_SIZE
+        keys = self.keys
+        scores = self.scores
+        info = self.info
+        if keys[i + 1] ^ info[i + 1] ^ scores[i + 1] == key:
+            slot = i + 1
+        elif keys[i] ^ info[i] ^ scores[i] == key or not info[i] >> 32:
+            slot = i
+        else:
+            old = info[i]
+            stale = ((old >> 26) & 0x3F) != self.generation
+            slot = i if stale or depth >= ((old >> 16) & 0xFF) else i + 1
+        if not move_code and keys[slot] ^ info[slot] ^ scores[slot] == key:
+            move_code = info[slot] & 0xFFFF
+        bits = _QWORD.unpack(_DOUBLE.pack(score))[0]
+        data = (move_code | (min(depth, 0xFF) << 16) | (bound << 24)
+                | (self.generation << 26) | (1 << 32))
+        scores[slot] = bits
+        info[slot] = data
+        keys[slot] = key ^ data ^ bits